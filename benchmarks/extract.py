@@ -0,0 +1,83 @@
+"""
+Serial vs. parallel setup file extraction benchmark
+
+Builds a synthetic IPS-like release archive (30,000 small PHP, JS and template files by default) and times
+ZipExtractor with a single worker against a worker pool.
+
+Usage: python benchmarks/extract.py [--files 30000] [--workers 0] [--runs 3]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from zipfile import ZipFile, ZIP_DEFLATED
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from ips_vagrant.common.extract import ZipExtractor, resolve_workers
+from ips_vagrant.downloaders.ips import IpsManager
+
+
+def build_archive(path, files):
+    """
+    Build a synthetic release archive
+    @type   path:   str
+    @param  files:  Number of files
+    @type   files:  int
+    """
+    rand = random.Random(0)
+    extensions = ('php', 'js', 'phtml', 'css')
+    with ZipFile(path, 'w', ZIP_DEFLATED) as z:
+        z.writestr('ips_bench/', '')
+        for i in range(files):
+            app = 'applications/app{a}/modules/mod{m}'.format(a=i % 40, m=i % 25)
+            name = '{d}/file{i}.{e}'.format(d=app, i=i, e=extensions[i % len(extensions)])
+            body = ''.join(rand.choice('abcdefghij {}();\n') for _ in range(rand.randint(512, 8192)))
+            z.writestr('ips_bench/' + name, body)
+
+
+def run(archive, workers, runs):
+    """
+    Time an extraction, returning the best of several runs
+    @rtype: float
+    """
+    timings = []
+    for _ in range(runs):
+        dest = tempfile.mkdtemp('ipsv-bench')
+        try:
+            start = time.time()
+            ZipExtractor(archive, IpsManager.SETUP_DIR, workers).extract(dest)
+            timings.append(time.time() - start)
+        finally:
+            shutil.rmtree(dest)
+
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial vs. parallel setup file extraction benchmark')
+    parser.add_argument('--files', type=int, default=30000, help='Number of files in the synthetic archive')
+    parser.add_argument('--workers', type=int, default=0, help='Parallel workers (0 for one per CPU core)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per mode (the best run is reported)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp('ipsv-bench')
+    try:
+        archive = os.path.join(tmpdir, 'release.zip')
+        print('Building a synthetic archive with {f} files...'.format(f=args.files))
+        build_archive(archive, args.files)
+
+        workers = resolve_workers(args.workers)
+        serial = run(archive, 1, args.runs)
+        parallel = run(archive, workers, args.runs)
+        print('Serial (1 worker):      {t:.2f}s'.format(t=serial))
+        print('Parallel ({w} workers): {t:.2f}s'.format(w=workers, t=parallel))
+        print('Speedup:                {s:.2f}x'.format(s=serial / parallel))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
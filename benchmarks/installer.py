@@ -0,0 +1,290 @@
+"""
+Installer HTTP client benchmark
+
+Runs the IPS installation wizard against a local mock installer, first with the previous transport (a mechanize
+browser for the wizard pages plus separate Requests sessions for Ajax and plain requests, each loading the cookie
+jar from disk), then with the shared keep-alive Browser client, and finally with the shared client posting the wizard
+steps directly (the fast path). Reports the wall time, requests and TCP connections of each run.
+
+Usage: python benchmarks/installer.py [--steps 200] [--runs 3] [--tls]
+"""
+import os
+import ssl
+import sys
+import socket
+import json
+import shutil
+import time
+import argparse
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from ips_vagrant.common import cookiejar, config as load_config
+from ips_vagrant.common.progress import quiet
+from ips_vagrant.common.ssl import CertificateFactory
+from ips_vagrant.installer.latest import Installer
+
+try:
+    import mechanize
+except ImportError:
+    mechanize = None
+
+requests.packages.urllib3.disable_warnings()
+
+PAGE = '<html><head><title>{title}</title></head><body>{body}</body></html>'
+FORM = '<form method="post" action="?controller={c}"><input type="hidden" name="{c}_submitted" value="1">{fields}' \
+       '<button type="submit" name="submit" value="1">Go</button></form>'
+
+# Wizard forms, in order, with the fields each one requires
+FORMS = (
+    ('license', '<input name="lkey"><input type="checkbox" name="eula_checkbox" value="1">', ('lkey', 'eula_checkbox')),
+    ('applications', '<input type="checkbox" name="apps[core]" value="1" checked>', ('apps[core]',)),
+    ('serverdetails', ''.join('<input name="{f}">'.format(f=f) for f in ('sql_host', 'sql_user', 'sql_pass',
+                                                                        'sql_database')),
+     ('sql_host', 'sql_user', 'sql_pass', 'sql_database')),
+    ('admin', ''.join('<input name="{f}">'.format(f=f) for f in ('admin_user', 'admin_pass1', 'admin_pass2',
+                                                                'admin_email')),
+     ('admin_user', 'admin_pass1', 'admin_pass2', 'admin_email'))
+)
+
+
+class MockInstallerHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages and MultipleRedirect responses of the IPS installation wizard. Accepted forms redirect to the
+    next step, rejected forms are shown again.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        query = parse_qs(urlparse(self.path).query)
+        base = self.server.base_url
+        if 'mr' in query:
+            step = int(query['mr'][0]) + 1
+            if step >= self.server.steps:
+                return self.send(json.dumps({'redirect': base + '?done=1'}), 'application/json')
+            return self.send(json.dumps([step, 'Step {s}'.format(s=step), 100.0 * step / self.server.steps]),
+                             'application/json')
+
+        if 'done' in query:
+            return self.send(PAGE.format(title='Done', body='<h1 id="elInstaller_welcome">Welcome</h1>'
+                                         '<p class="ipsType_light">Installed</p>'
+                                         '<a class="ipsButton_primary" href="http://suite/">Go</a>'))
+
+        controller = query.get('controller', ['index'])[0]
+        forms = {name: fields for name, fields, required in FORMS}
+        if controller == 'index':
+            body = '<a href="?controller=systemcheck">Start Installation</a>'
+        elif controller == 'systemcheck':
+            body = '<ul class="ipsList_checks"><li class="pass">PHP</li></ul><a href="?controller=license">Continue</a>'
+        elif controller in forms:
+            body = FORM.format(c=controller, fields=forms[controller])
+        elif controller == 'install':
+            body = '<a class="button" href="{u}?controller=install&mr=0">Start</a>'.format(u=base)
+        else:
+            return self.send('', status=404)
+
+        self.send(PAGE.format(title='Step {c}'.format(c=controller), body=body))
+
+    def do_POST(self):
+        self.server.requests += 1
+        data = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        controller = parse_qs(urlparse(self.path).query)['controller'][0]
+        names = [name for name, fields, required in FORMS] + ['install']
+        if controller not in names[:-1]:
+            return self.send('', status=404)
+
+        fields, required = {name: (fields, required) for name, fields, required in FORMS}[controller]
+        if all(field in data for field in ('{c}_submitted'.format(c=controller),) + required):
+            self.send_response(303)
+            self.send_header('Location', '{u}/index.php?controller={c}'.format(
+                u=self.server.base_url, c=names[names.index(controller) + 1]))
+            self.send_header('Content-Length', '0')
+            return self.end_headers()
+
+        self.send(PAGE.format(title='Step {c}'.format(c=controller), body=FORM.format(c=controller, fields=fields)))
+
+    def send(self, body, content_type='text/html', status=200):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockInstallerServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, steps, context=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), MockInstallerHandler)
+        self.steps = steps
+        self.context = context
+        self.connections = 0
+        self.requests = 0
+        self.base_url = '{s}://127.0.0.1:{p}/admin/install'.format(s='https' if context else 'http',
+                                                                   p=self.server_address[1])
+
+    def get_request(self):
+        sock, address = HTTPServer.get_request(self)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        if self.context:
+            sock = self.context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+
+class LegacyForm(object):
+    def __init__(self, browser):
+        self.browser = browser
+
+    def __setitem__(self, name, value):
+        self.browser.form[name] = value
+
+    def check(self, name):
+        self.browser.find_control(name).items[0].selected = True
+
+
+class LegacyBrowser(object):
+    """
+    The previous installer transport, behind the Browser interface
+    """
+    def __init__(self, context=None):
+        self.browser = mechanize.Browser()
+        self.browser.set_handle_robots(False)
+        self.browser.set_cookiejar(cookiejar())
+        if context:
+            self.browser.set_ca_data(context=context)
+        self.sessions = {}
+
+    def open(self, url):
+        self.browser.open(url)
+
+    @property
+    def response(self):
+        response = self.browser.response()
+        return SimpleNamespace(status_code=response.code, url=response.geturl())
+
+    @property
+    def soup(self):
+        return BeautifulSoup(self.browser.response().read(), 'html.parser')
+
+    @property
+    def form(self):
+        return LegacyForm(self.browser)
+
+    def title(self):
+        return self.browser.title()
+
+    def links(self, text_regex=None):
+        return self.browser.links(text_regex=text_regex)
+
+    def follow_link(self, link):
+        self.browser.follow_link(link)
+
+    def select_form(self, nr=0):
+        self.browser.select_form(nr=nr)
+
+    def submit(self):
+        self.browser.submit()
+
+    def request(self, url, method='get', params=None, ajax=False, timeout=None):
+        kind = 'ajax' if ajax else 'http'
+        if kind not in self.sessions:
+            session = requests.Session()
+            if ajax:
+                session.headers.update({'X-Requested-With': 'XMLHttpRequest'})
+            session.cookies.update(cookiejar())
+            session.verify = False
+            self.sessions[kind] = session
+
+        return self.sessions[kind].request(method, url, params, verify=False, timeout=timeout)
+
+
+def run(server, legacy, fast_path, runs, client_context, tmpdir):
+    """
+    Run the installation wizard, returning the best wall time and the requests and connections of each run
+    @rtype: tuple of (float, int, int)
+    """
+    config = load_config()
+    config.read_dict({'User': {'AdminUser': 'admin', 'AdminPass': 'secret', 'AdminEmail': 'admin@example.com'},
+                      'Installer': {'FastPath': str(fast_path)}, 'Paths': {'Log': tmpdir}})
+    ctx = SimpleNamespace(config=config)
+    host = urlparse(server.base_url).netloc
+    site = SimpleNamespace(ssl=bool(server.context), domain=SimpleNamespace(name=host), name='bench',
+                           version='bench', license_key='XXXXX', root=tmpdir, db_host='localhost', db_name='ipsv_bench',
+                           db_user='ipsv_bench', db_pass='secret', in_dev=False)
+
+    timings = []
+    for _ in range(runs):
+        server.connections = 0
+        server.requests = 0
+        installer = Installer(ctx, site)
+        if legacy:
+            installer.browser = LegacyBrowser(client_context)
+
+        start = time.time()
+        with quiet():
+            installer.start()
+        timings.append(time.time() - start)
+
+    return min(timings), server.requests, server.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Installer HTTP client benchmark')
+    parser.add_argument('--steps', type=int, default=200, help='Number of MultipleRedirect steps in the installation')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per client (the best run is reported)')
+    parser.add_argument('--tls', action='store_true', help='Serve the mock installer over HTTPS')
+    args = parser.parse_args()
+
+    server_context = client_context = None
+    tmpdir = tempfile.mkdtemp('ipsv-bench')
+    if args.tls:
+        certificate = CertificateFactory(SimpleNamespace(name='bench', domain=SimpleNamespace(name='127.0.0.1')))\
+            .get(digest='sha256')
+        cert_path, key_path = os.path.join(tmpdir, 'cert.pem'), os.path.join(tmpdir, 'key.pem')
+        with open(cert_path, 'w') as f:
+            f.write(certificate.certificate)
+        with open(key_path, 'w') as f:
+            f.write(certificate.key)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert_path, key_path)
+        client_context = ssl._create_unverified_context()
+
+    server = MockInstallerServer(args.steps, server_context)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        print('Mock installation with {s} MultipleRedirect steps over {p}'
+              .format(s=args.steps, p='HTTPS' if args.tls else 'HTTP'))
+        results = []
+        if mechanize is None:
+            print('mechanize is not installed, skipping the previous transport')
+        else:
+            results.append(('mechanize + sessions', run(server, True, False, args.runs, client_context, tmpdir)))
+        results.append(('Shared Browser', run(server, False, False, args.runs, client_context, tmpdir)))
+        results.append(('Shared Browser, fast path', run(server, False, True, args.runs, client_context, tmpdir)))
+
+        baseline = results[0][1][0]
+        for label, (elapsed, requests_made, connections) in results:
+            print('{l:<27}{t:.3f}s, {r} requests, {c} connections, {s:.2f}x'.format(
+                l=label + ':', t=elapsed, r=requests_made, c=connections, s=baseline / elapsed))
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
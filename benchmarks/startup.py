@@ -0,0 +1,84 @@
+"""
+CLI startup time budget
+
+Runs simple ipsv commands under python -X importtime and checks the time spent importing ipsv and its dependencies
+against a budget, and that none of the heavy subsystems (SQLAlchemy, Requests, mechanize, BeautifulSoup, Jinja2) are
+imported by commands that don't use them. Interpreter startup (the site module) isn't counted. Exits with status 1
+if any command is over its budget, so it can be run as a check.
+
+Usage: python benchmarks/startup.py [--runs 5] [--scale 1.0]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+# Command arguments, import time budget in milliseconds, and whether heavy subsystems may be imported
+BUDGETS = (
+    (['--help'], 40, False),
+    (['--version'], 40, False),
+    (['stats', '--help'], 40, False),
+    (['list', '--help'], 250, True),
+)
+
+HEAVY_MODULES = ('sqlalchemy', 'requests', 'mechanize', 'bs4', 'jinja2')
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(args):
+    """
+    Run ipsv with the given arguments and collect its import times
+    @type   args:   list of str
+    @return:    Microseconds spent on top-level imports outside interpreter startup, and every imported module
+    @rtype:     tuple of (int, set of str)
+    """
+    code = 'import sys; from ips_vagrant.cli import cli; sys.argv[0] = "ipsv"; cli({a!r})'.format(a=args)
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+
+    total = 0
+    modules = set()
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules.add(module)
+        if indent == 1 and module != 'site':
+            total += cumulative
+
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup time budget')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per command (the best run is reported)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget, e.g. for slower machines')
+    args = parser.parse_args()
+
+    failed = False
+    for command, budget, heavy_allowed in BUDGETS:
+        runs = [import_times(command) for _ in range(args.runs)]
+        best = min(total for total, modules in runs) / 1000.0
+        heavy = sorted({m.split('.')[0] for total, modules in runs for m in modules} & set(HEAVY_MODULES))
+
+        problems = []
+        if best > budget * args.scale:
+            problems.append('over budget')
+        if heavy and not heavy_allowed:
+            problems.append('imports {h}'.format(h=', '.join(heavy)))
+        failed = failed or bool(problems)
+
+        print('ipsv {c:<16}{t:>7.1f}ms / {b:g}ms  {s}'.format(
+            c=' '.join(command), t=best, b=budget * args.scale, s='FAIL: ' + '; '.join(problems) if problems else 'OK'))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
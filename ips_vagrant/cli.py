@@ -1,12 +1,13 @@
 import os
+import ast
+import sys
+import time
 import click
 import logging
 import pkgutil
 import importlib
 from configparser import ConfigParser
 from ips_vagrant import __version__
-from ips_vagrant.scrapers import Login
-from ips_vagrant.models.sites import Session
 
 CONTEXT_SETTINGS = dict(auto_envvar_prefix='IPSV', max_content_width=100)
 
@@ -21,17 +22,31 @@ class Context(object):
         self.config_path = None
         self.log = None
         self.cache = True
+        self.refresh = False
         self.database = NotImplemented
         self.basedir = os.path.join(os.path.dirname(os.path.realpath(__file__)))
 
         self.load_config(os.path.join(self.basedir, 'config', 'ipsv.conf'))
         self._login = None
+        self._login_checked = 0
 
     def setup(self):
         """
         Run deferred __init__ tasks
         """
-        self._login = Login(self)
+        pass
+
+    @property
+    def login(self):
+        """
+        Get the login handler, loading the saved login session on first use
+        @rtype: ips_vagrant.scrapers.login.Login
+        """
+        if self._login is None:
+            from ips_vagrant.scrapers.login import Login
+            self._login = Login(self)
+
+        return self._login
 
     @property
     def db(self):
@@ -39,10 +54,20 @@ class Context(object):
         Get a loaded database session
         """
         if self.database is NotImplemented:
+            from ips_vagrant.models.sites import Session
             self.database = Session
 
         return self.database
 
+    def close(self):
+        """
+        Close the registry session, rolling back any open transaction and releasing its connection
+        """
+        # Commands that never touched the registry never imported the models either
+        sites = sys.modules.get('ips_vagrant.models.sites')
+        if sites is not None:
+            sites.Session.remove()
+
     def load_config(self, path):
         """
         (Re-)load the configuration file
@@ -56,9 +81,15 @@ class Context(object):
         @param  use_session:    Use a saved session file if available
         @type   use_session:    bool
         """
-        # Should we try and return an existing login session?
-        if use_session and self._login.check():
-            self.cookiejar = self._login.cookiejar
+        # Should we try and return an existing login session? Sessions the daemon carries over between commands are
+        # only re-checked once the cache TTL has passed
+        if use_session and self.cookiejar is not None and \
+                time.time() - self._login_checked < self.config.getint('Cache', 'TTL'):
+            return self.cookiejar
+
+        if use_session and self.login.check():
+            self.cookiejar = self.login.cookiejar
+            self._login_checked = time.time()
             return self.cookiejar
 
         # Prompt the user for their login credentials
@@ -67,9 +98,10 @@ class Context(object):
         remember = click.confirm('Save login session?', True)
 
         # Process the login
-        cookiejar = self._login.process(username, password, remember)
+        cookiejar = self.login.process(username, password, remember)
         if remember:
             self.cookiejar = cookiejar
+            self._login_checked = time.time()
 
         return cookiejar
 
@@ -79,17 +111,38 @@ class IpsvCLI(click.MultiCommand):
     """
     IPS Vagrant Commandline Interface
     """
+    def main(self, args=None, prog_name=None, forward=True, **extra):
+        """
+        Run the CLI, forwarding the command to the ipsv daemon instead if it's running
+        @param  forward:    Forward the command to the daemon if possible
+        @type   forward:    bool
+        """
+        if forward:
+            from ips_vagrant.daemon import forward as forward_command
+            exit_code = forward_command(sys.argv[1:] if args is None else list(args))
+            if exit_code is not None:
+                sys.exit(exit_code)
+
+        return super(IpsvCLI, self).main(args, prog_name, **extra)
+
     def list_commands(self, ctx):
         """
         List CLI commands
         @type   ctx:    Context
         @rtype: list
         """
-        commands_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'commands')
-        command_list = [name for __, name, ispkg in pkgutil.iter_modules([commands_path]) if ispkg]
+        command_list = [name for __, name, ispkg in pkgutil.iter_modules([self.commands_path]) if ispkg]
         command_list.sort()
         return command_list
 
+    @property
+    def commands_path(self):
+        """
+        Path to the commands package
+        @rtype: str
+        """
+        return os.path.join(os.path.dirname(os.path.realpath(__file__)), 'commands')
+
     def get_command(self, ctx, name):
         """
         Get a bound command method
@@ -104,6 +157,52 @@ class IpsvCLI(click.MultiCommand):
         except (ImportError, AttributeError):
             return
 
+    def format_commands(self, ctx, formatter):
+        """
+        List the available commands. Short help texts are read from the command sources, so --help doesn't have to
+        import every command and everything they depend on.
+        @type   ctx:        Context
+        @type   formatter:  click.HelpFormatter
+        """
+        rows = []
+        for name in self.list_commands(ctx):
+            short_help = self._short_help(name)
+            if short_help is None:
+                command = self.get_command(ctx, name)
+                if command is None or command.hidden:
+                    continue
+                short_help = command.get_short_help_str()
+            rows.append((name, short_help))
+
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+    def _short_help(self, name):
+        """
+        Find the short_help of a command's cli decorator without importing the command
+        @param  name:   Command name
+        @type   name:   str
+        @return:    The short help text, or None if it isn't a plain string in the command's decorator
+        @rtype: str or None
+        """
+        path = os.path.join(self.commands_path, name, '__init__.py')
+        try:
+            with open(path) as f:
+                tree = ast.parse(f.read(), path)
+        except (IOError, SyntaxError):
+            return None
+
+        for node in tree.body:
+            if not isinstance(node, ast.FunctionDef) or node.name != 'cli':
+                continue
+            for decorator in node.decorator_list:
+                for keyword in getattr(decorator, 'keywords', []):
+                    if keyword.arg == 'short_help' and isinstance(keyword.value, ast.Constant):
+                        return keyword.value.value
+
+        return None
+
 
 pass_context = click.make_pass_decorator(Context, ensure=True)
 
@@ -129,19 +228,22 @@ def cli(ctx, verbose, config):
     ctx.log = logging.getLogger('ipsv')
     ctx.log.setLevel(log_level)
 
-    # Console logger
-    console_format = logging.Formatter("[%(levelname)s] %(name)s: %(message)s")
-    ch = logging.StreamHandler()
-    ch.setLevel(log_level)
-    ch.setFormatter(console_format)
-    ctx.log.addHandler(ch)
+    # The daemon runs many commands in one process, so the handlers are only added once
+    if not ctx.log.handlers:
+        # Console logger
+        console_format = logging.Formatter("[%(levelname)s] %(name)s: %(message)s")
+        ch = logging.StreamHandler()
+        ch.setFormatter(console_format)
+        ctx.log.addHandler(ch)
 
-    # File logger
-    file_format = logging.Formatter("[%(asctime)s] [%(levelname)s] %(name)s: %(message)s")
-    file_logger = logging.FileHandler(os.path.join(ctx.config.get('Paths', 'Log'), 'ipsv.log'))
-    file_logger.setLevel(log_level)
-    file_logger.setFormatter(file_format)
-    ctx.log.addHandler(file_logger)
+        # File logger
+        file_format = logging.Formatter("[%(asctime)s] [%(levelname)s] %(name)s: %(message)s")
+        file_logger = logging.FileHandler(os.path.join(ctx.config.get('Paths', 'Log'), 'ipsv.log'))
+        file_logger.setFormatter(file_format)
+        ctx.log.addHandler(file_logger)
+
+    for handler in ctx.log.handlers:
+        handler.setLevel(log_level)
 
     # Load the configuration
     if os.path.isfile(config):
@@ -153,3 +255,7 @@ def cli(ctx, verbose, config):
         ctx.log.debug('Loading default configuration: %s', ctx.config_path)
 
     ctx.setup()
+
+    # Each command gets its own registry session, closed when the command finishes so any open transaction is rolled
+    # back and the connection released
+    click.get_current_context().call_on_close(ctx.close)
@@ -0,0 +1,171 @@
+import os
+import glob
+import click
+import logging
+
+from ips_vagrant.cli import pass_context, Context
+from ips_vagrant.commands.new import WRITEABLE_DIRS, claim_database, database_exists, write_ssl_certificate
+from ips_vagrant.common import domain_parse
+from ips_vagrant.common.clone import TreeCloner
+from ips_vagrant.common.mysql import MysqlAdmin
+from ips_vagrant.common.pipeline import Pipeline
+from ips_vagrant.common.progress import Echo
+from ips_vagrant.common.services import ServiceReloader
+from ips_vagrant.installer.snapshot import rewrite_config
+from ips_vagrant.models.sites import Domain, Site
+
+
+# Files that are written in place by IPS, and so are never shared with the source site through hardlinks
+PRIVATE_FILES = ('conf_global.php', 'constants.php')
+
+
+@click.command('clone', short_help='Clones an existing IPS installation.')
+@click.argument('dname', metavar='<domain>')
+@click.argument('site', metavar='<site>')
+@click.argument('new_name', metavar='<new-name>')
+@click.option('-d', '--domain', 'new_dname', help='Domain name for the clone. (Default: The source domain)')
+@click.option('--link', type=click.Choice(['reflink', 'hardlink', 'copy']),
+              help='How files are cloned. Hardlinked files are shared with the source site, so only use hardlinks if '
+                   'neither site will be upgraded. (Default: [Clone] Link)')
+@click.option('-f', '--force', is_flag=True,
+              help='Overwrite any existing files or database (possibly left over from a broken configuration)')
+@click.option('--enable/--disable', prompt='Do you want to enable this site after cloning?', default=True,
+              help='Enable the clone. Note that this will automatically disable any existing sites running on its '
+                   'domain. (Default: True)')
+@pass_context
+def cli(ctx, dname, site, new_name, new_dname, link, force, enable):
+    """
+    Clones the files and database of the <site> under the specified <domain> into a new installation named <new-name>
+    """
+    assert isinstance(ctx, Context)
+    log = logging.getLogger('ipsv.clone')
+
+    dname = domain_parse(dname).hostname
+    domain = Domain.get(dname)
+    if not domain:
+        click.secho('No such domain: {dn}'.format(dn=dname), fg='red', bold=True, err=True)
+        return
+
+    site_name = site
+    site = Site.get(domain, site_name)
+    if not site:
+        click.secho('No such site: {site}'.format(site=site_name), fg='red', bold=True, err=True)
+        return
+
+    # The sites are read again after the clone is committed, so keep them loaded
+    ctx.db().expire_on_commit = False
+    new_domain = Domain.get_or_create(domain_parse(new_dname)) if new_dname else domain
+    if Site.get(new_domain, new_name):
+        click.secho('An installation named "{s}" has already been created for the domain {d}'
+                    .format(s=new_name, d=new_domain.name), err=True, fg='red', bold=True)
+        raise click.Abort
+
+    p = Echo('Constructing site data...')
+    clone = Site(domain=new_domain, name=new_name, license_key=site.license_key, version=site.version, ssl=site.ssl,
+                 spdy=site.spdy, gzip=site.gzip, enabled=enable, in_dev=site.in_dev)
+
+    status = p.OK
+    if os.path.exists(clone.root):
+        if not force:
+            p.done(p.FAIL)
+            click.secho("Installation path already exists and --force was not passed:\n{p}".format(p=clone.root),
+                        err=True, fg='red', bold=True)
+            raise click.Abort
+
+        log.warn('Overwriting existing installation path: {p}'.format(p=clone.root))
+        status = p.WARN
+
+    drop_database = bool(site.db_name) and database_exists(ctx, clone)
+    if drop_database and not force:
+        p.done(p.FAIL)
+        click.secho('A previous database for this installation already exists and --force was not passed',
+                    err=True, fg='red', bold=True)
+        raise click.Abort
+
+    ctx.db.add(clone)
+    ctx.db.commit()
+    os.makedirs(clone.root, 0o755, exist_ok=True)
+    p.done(status)
+
+    # Files, database and server configuration are cloned concurrently. Stages using the database session run
+    # inline, on this thread, and the others read detached copies of both sites, as the inline stages commit the clone.
+    pipeline = Pipeline()
+    detached = clone.detach()
+    src_root, src_db_name = site.root, site.db_name
+    src_ssl = (site.ssl_key, site.ssl_certificate)
+    same_domain = new_domain.id == domain.id
+
+    def clone_files():
+        cloner = TreeCloner(src_root, link or ctx.config.get('Clone', 'Link'), ctx.config.getint('Extract', 'Workers'))
+        cloner.clone(detached.root,
+                     copy=lambda path: path in PRIVATE_FILES or path.split(os.sep, 1)[0] in WRITEABLE_DIRS)
+
+    def clone_database():
+        credentials = claim_database(ctx, detached, drop_database)
+        MysqlAdmin.get(ctx.config).copy_database(src_db_name, credentials[0])
+        return credentials
+
+    def ssl_certificate():
+        # Certificates are issued for the domain, so the source site's certificate can be reused on the same domain
+        if src_ssl[0] and same_domain:
+            ssl_path = os.path.join(ctx.config.get('Paths', 'NginxSSL'), detached.domain.name)
+            if not os.path.exists(ssl_path):
+                os.makedirs(ssl_path, 0o755)
+            with open(os.path.join(ssl_path, '{s}.key'.format(s=detached.slug)), 'w') as f:
+                f.write(src_ssl[0])
+            with open(os.path.join(ssl_path, '{s}.pem'.format(s=detached.slug)), 'w') as f:
+                f.write(src_ssl[1])
+            return src_ssl
+
+        sc = write_ssl_certificate(ctx, detached)
+        return sc.key, sc.certificate
+
+    def save_credentials():
+        if clone.ssl:
+            clone.ssl_key, clone.ssl_certificate = pipeline['ssl']
+        if site.db_name:
+            clone.db_host = site.db_host
+            clone.db_name, clone.db_user, clone.db_pass = pipeline['database']
+        ctx.db.commit()
+
+    def configure():
+        conf_path = os.path.join(detached.root, 'conf_global.php')
+        if os.path.isfile(conf_path):
+            settings = {'base_url': '{scheme}://{host}/'.format(scheme='https' if detached.ssl else 'http',
+                                                               host=detached.domain.name)}
+            if src_db_name:
+                settings.update(zip(('sql_database', 'sql_user', 'sql_pass'), pipeline['database']))
+            rewrite_config(conf_path, settings)
+
+        # Cached settings refer to the source site, so let IPS rebuild them
+        for cache_path in glob.glob(os.path.join(detached.root, 'datastore', '*.php')):
+            os.remove(cache_path)
+
+    def reload_nginx():
+        ServiceReloader.get('nginx', ctx.config).reload()
+
+    pipeline.add('files', clone_files, label='Cloning files...')
+    pipeline.add('nginx', detached.write_nginx_config, label='Constructing paths and configuration files...')
+    credentials = []
+    if site.db_name:
+        pipeline.add('database', clone_database, label='Cloning MySQL database...')
+        credentials.append('database')
+    if clone.ssl:
+        pipeline.add('ssl', ssl_certificate, label='Writing SSL certificate...')
+        credentials.append('ssl')
+    pipeline.add('credentials', save_credentials, credentials, inline=True)
+    pipeline.add('configure', configure, ['files'] + credentials, 'Writing configuration files...')
+    if enable:
+        pipeline.add('enable', lambda: clone.enable(force), ('nginx',), inline=True)
+        pipeline.add('reload', reload_nginx, ['enable', 'configure'] + (['ssl'] if clone.ssl else []),
+                     'Reloading web server...')
+
+    pipeline.run()
+    log.info('Critical path: %s', ', '.join('{n} ({e:.2f}s)'.format(n=s.name, e=s.elapsed)
+                                            for s in pipeline.critical_path()))
+
+    click.echo('------')
+    if not site.db_name:
+        click.secho('The source site has not been installed, so no database was cloned', fg='yellow', bold=True)
+    click.secho('{s} cloned in {t:.1f}s'.format(s=clone.name, t=pipeline.elapsed), fg='green', bold=True)
+    click.echo('{schema}://{host}'.format(schema='https' if clone.ssl else 'http', host=clone.domain.name))
@@ -1,9 +1,10 @@
 import os
 import shutil
 import click
-import subprocess
 from ips_vagrant.cli import pass_context, Context
 from ips_vagrant.common import domain_parse
+from ips_vagrant.common.mysql import MysqlAdmin
+from ips_vagrant.common.services import ServiceReloader, ServiceError
 from ips_vagrant.models.sites import Domain, Site, Session
 
 
@@ -24,9 +25,9 @@ def cli(ctx, dname, site, delete_code, no_prompt):
 
     # Get the domain
     dname = domain_parse(dname)
-    domain = Domain.get(dname)
+    domain = Domain.get(dname, load_sites=True)
     if not domain:
-        click.secho('No such domain: {dn}'.format(dn=domain.name), fg='red', bold=True, err=True)
+        click.secho('No such domain: {dn}'.format(dn=dname.hostname), fg='red', bold=True, err=True)
         return
 
     domain_sites = {site.name.lower(): site for site in domain.sites}
@@ -37,20 +38,27 @@ def cli(ctx, dname, site, delete_code, no_prompt):
             click.secho('No such site "{sn}" under the domain {dn}'.format(sn=site, dn=domain.name))
         site = domain_sites[site.lower()]
 
-        delete_single(site, domain, delete_code, no_prompt)
-        return
+        delete_single(site, domain, delete_code, no_prompt, ctx.config)
+    else:
+        # Delete the entire domain
+        delete_all(domain, delete_code, no_prompt, ctx.config)
 
-    # Delete the entire domain
-    delete_all(domain, delete_code, no_prompt)
+    # Reload Nginx once the server blocks are gone
+    try:
+        ServiceReloader.get('nginx', ctx.config).reload()
+    except ServiceError as e:
+        raise click.ClickException(str(e))
 
 
-def delete_single(site, domain, delete_code=False, no_prompt=False):
+def delete_single(site, domain, delete_code=False, no_prompt=False, config=None):
     """
     Delete a single site
     @type   site:           Site
     @type   domain:         Domain
     @type   delete_code:    bool
     @type   no_prompt:      bool
+    @param  config:         Configuration to read the [MySQL] settings from (Default: the system configuration)
+    @type   config:         configparser.ConfigParser or None
     """
     click.secho('Deleting installation "{sn}" hosted on the domain {dn}'.format(sn=site.name, dn=domain.name),
                 fg='yellow', bold=True)
@@ -74,7 +82,7 @@ def delete_single(site, domain, delete_code=False, no_prompt=False):
                                       'still be preserved.', fg='white', bold=True)
             click.confirm(prompt_text, abort=True)
 
-    site.delete()
+    site.delete(config=config)
 
     if delete_code:
         _remove_code(site)
@@ -87,17 +95,15 @@ def delete_single(site, domain, delete_code=False, no_prompt=False):
     Session.commit()
     click.secho('{sn} removed'.format(sn=site.name), fg='yellow', bold=True)
 
-    # Restart Nginx
-    FNULL = open(os.devnull, 'w')
-    subprocess.check_call(['service', 'nginx', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
-
 
-def delete_all(domain, delete_code=False, no_prompt=False):
+def delete_all(domain, delete_code=False, no_prompt=False, config=None):
     """
     Delete all sites under a domain
     @type   domain:         Domain
     @type   delete_code:    bool
     @type   no_prompt:      bool
+    @param  config:         Configuration to read the [MySQL] settings from (Default: the system configuration)
+    @type   config:         configparser.ConfigParser or None
     """
     click.secho('All of the following installations hosted on the domain {dn} will be deleted:'
                 .format(dn=domain.name), fg='yellow', bold=True)
@@ -129,18 +135,17 @@ def delete_all(domain, delete_code=False, no_prompt=False):
             click.confirm(prompt_text, abort=True)
 
     for site in sites:
-        Session.delete(site)
+        site.delete(drop_database=False)
         if delete_code:
             _remove_code(site)
         click.secho('{sn} removed'.format(sn=site.name), fg='yellow', bold=True)
 
+    # Drop every site's database in a single batch
+    MysqlAdmin.get(config).drop_databases([(site.db_name, site.db_user) for site in sites if site.db_name])
+
     Session.delete(domain)
     Session.commit()
 
-    # Restart Nginx
-    FNULL = open(os.devnull, 'w')
-    subprocess.check_call(['service', 'nginx', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
-
 
 def _remove_code(site):
     """
@@ -1,10 +1,9 @@
-import os
 import click
-import subprocess
 from ips_vagrant.cli import Context, pass_context
 from ips_vagrant.common import domain_parse
 from ips_vagrant.common.progress import Echo
-from ips_vagrant.models.sites import Session, Domain
+from ips_vagrant.common.services import ServiceReloader, ServiceError
+from ips_vagrant.models.sites import Domain
 
 
 @click.command('disable', short_help='Disable installations under a domain.')
@@ -17,7 +16,7 @@ def cli(ctx, dname):
     assert isinstance(ctx, Context)
 
     dname = domain_parse(dname).hostname
-    domain = Session.query(Domain).filter(Domain.name == dname).first()
+    domain = Domain.get(dname, load_sites=True)
     if not domain:
         click.secho('No such domain: {dn}'.format(dn=dname), fg='red', bold=True, err=True)
         return
@@ -28,8 +27,11 @@ def cli(ctx, dname):
             click.secho('Disabling site {sn}'.format(sn=site.name), bold=True)
             site.disable()
 
-    # Restart Nginx
-    p = Echo('Restarting web server...')
-    FNULL = open(os.devnull, 'w')
-    subprocess.check_call(['service', 'nginx', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
+    # Reload Nginx
+    p = Echo('Reloading web server...')
+    try:
+        ServiceReloader.get('nginx', ctx.config).reload()
+    except ServiceError as e:
+        p.done(p.FAIL)
+        raise click.ClickException(str(e))
     p.done()
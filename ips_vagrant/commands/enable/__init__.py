@@ -1,10 +1,9 @@
-import os
 import click
-import subprocess
 from ips_vagrant.cli import Context, pass_context
 from ips_vagrant.common import domain_parse
 from ips_vagrant.common.progress import Echo
-from ips_vagrant.models.sites import Session, Domain, Site
+from ips_vagrant.common.services import ServiceReloader, ServiceError
+from ips_vagrant.models.sites import Domain, Site
 
 
 @click.command('enable', short_help='Enable an IPS installation.')
@@ -18,7 +17,7 @@ def cli(ctx, dname, site):
     assert isinstance(ctx, Context)
 
     dname = domain_parse(dname).hostname
-    domain = Session.query(Domain).filter(Domain.name == dname).first()
+    domain = Domain.get(dname)
     if not domain:
         click.secho('No such domain: {dn}'.format(dn=dname), fg='red', bold=True, err=True)
         return
@@ -33,8 +32,11 @@ def cli(ctx, dname, site):
     site.enable()
     p.done()
 
-    # Restart Nginx
-    p = Echo('Restarting web server...')
-    FNULL = open(os.devnull, 'w')
-    subprocess.check_call(['service', 'nginx', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
+    # Reload Nginx
+    p = Echo('Reloading web server...')
+    try:
+        ServiceReloader.get('nginx', ctx.config).reload()
+    except ServiceError as e:
+        p.done(p.FAIL)
+        raise click.ClickException(str(e))
     p.done()
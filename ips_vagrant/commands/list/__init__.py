@@ -1,7 +1,7 @@
 import click
 from ips_vagrant.cli import pass_context, Context
 from ips_vagrant.common import domain_parse, styled_status
-from ips_vagrant.models.sites import Domain, Site, Session
+from ips_vagrant.models.sites import Domain, Site
 
 
 # noinspection PyUnboundLocalVariable
@@ -18,7 +18,7 @@ def cli(ctx, dname, site):
 
     if dname:
         dname = domain_parse(dname).hostname
-        domain = Session.query(Domain).filter(Domain.name == dname).first()
+        domain = Domain.get(dname)
 
         # No such domain
         if not domain:
@@ -3,7 +3,7 @@ import click
 import logging
 from ips_vagrant.cli import pass_context, Context
 from ips_vagrant.common import domain_parse
-from ips_vagrant.models.sites import Domain, Site, Session
+from ips_vagrant.models.sites import Domain, Site
 
 
 # noinspection PyUnboundLocalVariable
@@ -19,7 +19,7 @@ def cli(ctx, dname, site):
     log = logging.getLogger('ipsv.mysql')
 
     dname = domain_parse(dname).hostname
-    domain = Session.query(Domain).filter(Domain.name == dname).first()
+    domain = Domain.get(dname)
 
     # No such domain
     if not domain:
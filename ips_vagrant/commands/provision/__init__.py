@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import click
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ips_vagrant.cli import pass_context, Context
+from ips_vagrant.commands.new import write_ssl_certificate, copy_setup_files, resolve_version, install_site, \
+    database_credentials, database_owner, leftover_databases
+from ips_vagrant.common import domain_parse
+from ips_vagrant.common.mysql import MysqlAdmin, DatabasePool, random_password
+from ips_vagrant.common.progress import Echo, ProgressBar, quiet
+from ips_vagrant.common.services import ServiceReloader, ServiceError
+from ips_vagrant.downloaders import IpsManager
+from ips_vagrant.models.sites import Session, Domain, Site
+from ips_vagrant.scrapers import Licenses
+
+
+# Per-site settings and their defaults, mirroring the options of the new command
+SITE_DEFAULTS = {
+    'domain': 'localhost',
+    'version': None,
+    'ssl': None,
+    'spdy': False,
+    'gzip': True,
+    'enable': True,
+    'install': True,
+    'dev': False,
+    'force': False,
+    'full_install': False,
+    'installer': None
+}
+
+
+@click.command('provision', short_help='Creates IPS installations in bulk from a manifest.')
+@click.argument('manifest', metavar='<manifest>', type=click.Path(exists=True, dir_okay=False))
+@click.option('-w', '--workers', type=click.IntRange(1, None),
+              help='Number of sites provisioned concurrently. (Default: [Provision] Workers)')
+@click.option('--cache/--no-cache', envvar='CACHE', default=True,
+              help='Use cached version downloads if possible. (Default: True)')
+@click.option('--refresh', is_flag=True, envvar='REFRESH',
+              help='Ignore cached license and Developer Tools pages and fetch them again.')
+@click.option('--full-install', is_flag=True, envvar='FULL_INSTALL',
+              help='Always run the full IPS installer, instead of restoring database snapshots.')
+@click.option('--installer', 'backend', type=click.Choice(['web', 'cli']), envvar='IPSV_INSTALLER',
+              help='Installer backend for sites without an installer setting: web or cli. '
+                   '(Default: [Installer] Backend)')
+@pass_context
+def cli(ctx, manifest, workers, cache, refresh, full_install, backend):
+    """
+    Creates every installation listed in a JSON or YAML <manifest>, several at a time.
+
+    \b
+    Example manifest:
+        license: XXXXX-XXXXX-XXXXX-XXXXX-XXXXX
+        workers: 4
+        defaults:
+          domain: qa.local
+        sites:
+          - name: latest
+          - name: legacy
+            domain: legacy.qa.local
+            version: 4.0.11
+            dev: true
+
+    Each site accepts the name, domain, version, ssl, spdy, gzip, enable, install, full_install, installer, dev and
+    force settings of the new command. Each version is only downloaded and extracted once, and the web server is only
+    reloaded once.
+    """
+    assert isinstance(ctx, Context)
+    log = logging.getLogger('ipsv.provision')
+    ctx.cache = cache
+    ctx.refresh = refresh
+
+    data = load_manifest(manifest)
+    specs = site_specs(data, backend or ctx.config.get('Installer', 'Backend'))
+    workers = workers or data.get('workers') or ctx.config.getint('Provision', 'Workers')
+    if workers < 1:
+        raise click.ClickException('[Provision] Workers must be at least 1')
+
+    # Installations can't prompt for admin credentials while running in the background
+    if any(spec['install'] for spec in specs):
+        missing = [key for key in ('AdminUser', 'AdminPass', 'AdminEmail') if not ctx.config.get('User', key)]
+        if missing:
+            raise click.ClickException('Automatic installations require saved admin credentials, missing: {m}'
+                                       .format(m=', '.join('[User] ' + key for key in missing)))
+
+    # Look up the license and every requested version up front
+    login_session = ctx.get_login()
+    license_key = data.get('license') or ctx.config.get('User', 'LicenseKey')
+    if not license_key:
+        raise click.ClickException('No license key specified in the manifest or the [User] LicenseKey setting')
+
+    licenses = {lmeta.license_key: lmeta for lmeta in Licenses(login_session).get()}
+    if license_key not in licenses:
+        raise click.ClickException('License key not found on your account: {k}'.format(k=license_key))
+    lmeta = licenses[license_key]
+
+    p = Echo('Fetching IPS version information...')
+    ips = IpsManager(ctx, lmeta)
+    p.done()
+
+    for spec in specs:
+        spec['meta'] = resolve_version(ips, spec['version'])
+        spec['full_install'] = spec['full_install'] or full_install
+
+    # Download and extract each version once, no matter how many sites use it
+    trees = {}
+    for spec in specs:
+        vstring = spec['meta'].version.vstring
+        if vstring in trees:
+            continue
+
+        p = Echo('Fetching IPS version {vs}...'.format(vs=vstring))
+        ips.get(spec['meta'], cache)
+        tree = ips.release_tree(spec['meta'])
+        if not tree.exists:
+            tree.build()
+        trees[vstring] = tree
+        p.done()
+
+    # Site records and server configuration are written serially, then the web server is reloaded once
+    results = []
+    for spec in specs:
+        result = {'name': spec['name'], 'domain': spec['dname'].hostname, 'version': spec['meta'].version.vstring,
+                  'site_id': None, 'error': None, 'elapsed': 0.0}
+        results.append(result)
+
+        p = Echo('Constructing {d}/{n}...'.format(d=result['domain'], n=spec['name']))
+        start = time.time()
+        try:
+            result['site_id'] = construct_site(ctx, spec, lmeta)
+            p.done()
+        except Exception as e:
+            log.exception('Unable to construct site %s/%s', result['domain'], spec['name'])
+            result['error'] = str(e)
+            p.done(p.FAIL)
+        result['elapsed'] += time.time() - start
+
+    pending = [(spec, result) for spec, result in zip(specs, results) if result['site_id']]
+    if any(spec['install'] for spec, result in pending):
+        p = Echo('Creating MySQL databases...')
+        assign_databases(ctx, [(spec, result) for spec, result in pending if spec['install']])
+        p.done(p.FAIL if any(result['error'] for spec, result in pending) else p.OK)
+        pending = [(spec, result) for spec, result in pending if not result['error']]
+
+    if any(spec['enable'] for spec, result in pending):
+        p = Echo('Reloading web server...')
+        try:
+            ServiceReloader.get('nginx', ctx.config).reload()
+        except ServiceError as e:
+            p.done(p.FAIL)
+            raise click.ClickException(str(e))
+        p.done()
+
+    # Copy setup files and run the installations on a worker pool
+    if pending:
+        pbar = ProgressBar(len(pending), 'Provisioning sites...')
+        pbar.start()
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(provision_site, ctx, result['site_id'], trees[result['version']], spec): result
+                for spec, result in pending
+            }
+            for completed, future in enumerate(as_completed(futures), 1):
+                result = futures[future]
+                elapsed, error = future.result()
+                result['elapsed'] += elapsed
+                result['error'] = error
+                pbar.update(completed, '{d}/{n}'.format(d=result['domain'], n=result['name']))
+        pbar.finish()
+
+    print_results(results)
+    if any(result['error'] for result in results):
+        click.get_current_context().exit(1)
+
+
+def load_manifest(path):
+    """
+    Load a JSON or YAML provisioning manifest
+    @type   path:   str
+    @rtype: dict
+    """
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ('.yml', '.yaml'):
+            try:
+                import yaml
+            except ImportError:
+                raise click.ClickException('PyYAML is required to read YAML manifests (pip install PyYAML), or use '
+                                           'a JSON manifest instead')
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise click.ClickException('Unable to parse the manifest: {e}'.format(e=e))
+        else:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise click.ClickException('Unable to parse the manifest: {e}'.format(e=e))
+
+    if not isinstance(data, dict) or not isinstance(data.get('sites'), list) or not data['sites']:
+        raise click.ClickException('The manifest must contain a list of sites')
+
+    workers = data.get('workers')
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 1):
+        raise click.ClickException('The manifest workers setting must be a positive number: {w}'.format(w=workers))
+
+    return data
+
+
+def site_specs(data, backend='web'):
+    """
+    Build validated site specifications from a manifest
+    @type   data:       dict
+    @param  backend:    Installer backend for sites that don't set one
+    @type   backend:    str
+    @rtype: list of dict
+    """
+    defaults = dict(SITE_DEFAULTS, installer=backend)
+    defaults.update(data.get('defaults') or {})
+
+    specs = []
+    names = set()
+    enabled = set()
+    for entry in data['sites']:
+        spec = dict(defaults)
+        spec.update(entry if isinstance(entry, dict) else {})
+        unknown = set(spec) - set(SITE_DEFAULTS) - {'name'}
+        if unknown:
+            raise click.ClickException('Unknown site settings: {u}'.format(u=', '.join(sorted(unknown))))
+        if not spec.get('name'):
+            raise click.ClickException('Every site in the manifest needs a name')
+
+        spec['name'] = str(spec['name'])
+        spec['version'] = str(spec['version']) if spec['version'] else None
+        spec['dname'] = domain_parse(spec['domain'])
+        if spec['ssl'] is None:
+            spec['ssl'] = spec['dname'].scheme == 'https'
+        spec['installer'] = spec['installer'] or backend
+        if spec['installer'] not in ('web', 'cli'):
+            raise click.ClickException('Unknown installer for {n}: {i} (expected web or cli)'
+                                       .format(n=spec['name'], i=spec['installer']))
+
+        site_key = (spec['dname'].hostname, spec['name'].lower())
+        if site_key in names:
+            raise click.ClickException('Duplicate site in the manifest: {d}/{n}'.format(d=site_key[0], n=spec['name']))
+        names.add(site_key)
+
+        # The web installer runs through the web server, so only one site per domain can be installed at a time
+        if spec['install'] and spec['installer'] == 'web' and not spec['enable']:
+            raise click.ClickException('Sites must be enabled to be installed: {d}/{n}'
+                                       .format(d=site_key[0], n=spec['name']))
+        if spec['enable']:
+            if site_key[0] in enabled:
+                raise click.ClickException('Only one site can be enabled per domain: {d}'.format(d=site_key[0]))
+            enabled.add(site_key[0])
+
+        domain = Domain.get(spec['dname'].hostname)
+        if domain and Site.get(domain, spec['name']):
+            raise click.ClickException('An installation named "{n}" has already been created for the domain {d}'
+                                       .format(n=spec['name'], d=site_key[0]))
+
+        specs.append(spec)
+
+    return specs
+
+
+def construct_site(ctx, spec, lmeta):
+    """
+    Create a site's database entry and server configuration
+    @type   ctx:    Context
+    @type   spec:   dict
+    @type   lmeta:  ips_vagrant.scrapers.licenses.LicenseMeta
+    @return:    The new site's ID
+    @rtype:     int
+    """
+    log = logging.getLogger('ipsv.provision')
+    domain = Domain.get_or_create(spec['dname'])
+    site = Site(domain=domain, name=spec['name'], license_key=lmeta.license_key,
+                version=spec['meta'].version.vstring, ssl=spec['ssl'], spdy=spec['spdy'], gzip=spec['gzip'],
+                enabled=spec['enable'], in_dev=spec['dev'])
+
+    if os.path.exists(site.root):
+        if not spec['force']:
+            raise Exception('Installation path already exists and force was not set: {p}'.format(p=site.root))
+        log.warn('Overwriting existing installation path: {p}'.format(p=site.root))
+
+    ctx.db.add(site)
+    ctx.db.commit()
+
+    site.write_nginx_config()
+    if spec['ssl']:
+        sc = write_ssl_certificate(ctx, site)
+        site.ssl_key = sc.key
+        site.ssl_certificate = sc.certificate
+    if site.enabled:
+        site.enable(spec['force'])
+
+    ctx.db.commit()
+    return site.id
+
+
+def assign_databases(ctx, installs):
+    """
+    Claim or create the database of every site being installed up front. Databases the database pool can't supply
+    are all created in a single batch. Errors are recorded in the sites' results.
+    @type   ctx:        Context
+    @param  installs:   Specification and result pairs of the constructed sites being installed
+    @type   installs:   list of tuple of (dict, dict)
+    """
+    log = logging.getLogger('ipsv.provision')
+    admin = MysqlAdmin.get(ctx.config)
+    pool = DatabasePool(ctx.config.get('Paths', 'Data'), ctx.config.getint('MySQL', 'PoolSize'), ctx.config_path)
+
+    sites = [(Session.query(Site).get(result['site_id']), spec, result) for spec, result in installs]
+    leftovers = leftover_databases(ctx, [site for site, spec, result in sites])
+
+    # Leftover databases from previous installations are dropped and created again, the rest come from the pool.
+    # Leftover pooled databases don't have the site's own database name, so they're dropped separately.
+    batches = {False: [], True: []}
+    stale = []
+    for (site, spec, result), site_leftovers in zip(sites, leftovers):
+        db_name, db_user = database_credentials(site)
+        if site_leftovers:
+            if not spec['force']:
+                result['error'] = 'A previous database for this installation already exists and force was not set'
+                continue
+            stale += [c for c in site_leftovers if c[0] != db_name]
+            batches[True].append((site, result, (db_name, db_user, random_password())))
+            continue
+
+        credentials = pool.claim(database_owner(site))
+        if not credentials:
+            batches[False].append((site, result, (db_name, db_user, random_password())))
+            continue
+
+        site.db_host = 'localhost'
+        site.db_name, site.db_user, site.db_pass = credentials
+
+    for drop_existing, batch in batches.items():
+        try:
+            if drop_existing and stale:
+                admin.drop_databases(stale)
+            admin.create_databases([credentials for site, result, credentials in batch], drop_existing)
+        except Exception as e:
+            log.exception('Unable to create MySQL databases')
+            for site, result, credentials in batch:
+                result['error'] = str(e)
+            continue
+
+        for site, result, credentials in batch:
+            site.db_host = 'localhost'
+            site.db_name, site.db_user, site.db_pass = credentials
+
+    ctx.db.commit()
+    pool.refill_async()
+
+
+def provision_site(ctx, site_id, tree, spec):
+    """
+    Copy a site's setup files and run its installation. Runs on a worker thread with its own database session.
+    @type   ctx:        Context
+    @type   site_id:    int
+    @type   tree:       ips_vagrant.downloaders.releases.ReleaseTree
+    @type   spec:       dict
+    @return:    Seconds elapsed, and the error message if provisioning failed
+    @rtype:     tuple of (float, str or None)
+    """
+    log = logging.getLogger('ipsv.provision')
+    start = time.time()
+    try:
+        with quiet():
+            site = Session.query(Site).get(site_id)
+            copy_setup_files(tree, site)
+            if spec['install']:
+                install_site(ctx, site, spec['meta'].version, spec['force'], spec['full_install'],
+                             spec['installer'])
+    except Exception as e:
+        log.exception('Unable to provision site %s/%s', spec['dname'].hostname, spec['name'])
+        return time.time() - start, str(e) or e.__class__.__name__
+    finally:
+        Session.remove()
+
+    return time.time() - start, None
+
+
+def print_results(results):
+    """
+    Print the per-site result table
+    @type   results:    list of dict
+    """
+    width = max([len('{d}/{n}'.format(d=r['domain'], n=r['name'])) for r in results] + [4])
+    vwidth = max([len(r['version']) for r in results] + [7])
+    click.echo('------')
+    click.secho('{s:<{w}}  {v:<{vw}}  {st:<6}  {t:>8}'.format(s='Site', w=width, v='Version', vw=vwidth, st='Status',
+                                                             t='Time'), bold=True)
+    for r in results:
+        site = '{d}/{n}'.format(d=r['domain'], n=r['name'])
+        status = click.style('{st:<6}'.format(st='FAIL' if r['error'] else 'OK'), fg='red' if r['error'] else 'green',
+                             bold=True)
+        click.echo('{s:<{w}}  {v:<{vw}}  {st}  {t:>7.1f}s'.format(s=site, w=width, v=r['version'], vw=vwidth,
+                                                                  st=status, t=r['elapsed']))
+        if r['error']:
+            click.secho('    {e}'.format(e=r['error']), fg='red')
+
+    failed = len([r for r in results if r['error']])
+    click.echo('------')
+    if failed:
+        click.secho('{f} of {t} sites failed, see the log for details'.format(f=failed, t=len(results)),
+                    fg='red', bold=True)
+    else:
+        click.secho('{t} sites provisioned'.format(t=len(results)), fg='green', bold=True)
@@ -11,6 +11,7 @@ from alembic.config import Config
 import sys
 import re
 from ips_vagrant.common.progress import Echo
+from ips_vagrant.common.services import ServiceReloader, ServiceError
 from ips_vagrant.cli import pass_context, Context
 from ips_vagrant.generators.php5_fpm import FpmPoolConfig
 
@@ -95,10 +96,13 @@ def cli(ctx):
         os.unlink(default_enabled)
     p.done()
 
-    # Restart Nginx
-    FNULL = open(os.devnull, 'w')
+    # Restart Nginx, as it may not be running yet
     p = Echo('Restarting Nginx...')
-    subprocess.check_call(['service', 'nginx', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
+    try:
+        ServiceReloader.get('nginx', ctx.config).restart()
+    except ServiceError as e:
+        p.done(p.FAIL)
+        raise click.ClickException(str(e))
     p.done()
 
     # php.ini configuration
@@ -144,9 +148,13 @@ def cli(ctx):
         f.write(fpm_config)
     p.done()
 
-    # Restart php5-fpm
+    # Restart php5-fpm, as it may not be running yet
     p = Echo('Restarting php5-fpm...')
-    subprocess.check_call(['service', 'php5-fpm', 'restart'], stdout=FNULL, stderr=subprocess.STDOUT)
+    try:
+        ServiceReloader.get('php-fpm', ctx.config).restart()
+    except ServiceError as e:
+        p.done(p.FAIL)
+        raise click.ClickException(str(e))
     p.done()
 
     # Copy the man pages and rebuild the manual database
@@ -158,6 +166,7 @@ def cli(ctx):
 
     shutil.copyfile(man_path, os.path.join(sys_man_path, 'ipsv.1'))
 
+    FNULL = open(os.devnull, 'w')
     subprocess.check_call(['mandb'], stdout=FNULL, stderr=subprocess.STDOUT)
 
     # Enable the welcome message
@@ -0,0 +1,103 @@
+import click
+from ips_vagrant.cli import pass_context, Context
+from ips_vagrant.common import parse_version
+from ips_vagrant.installer.report import InstallReport
+
+
+@click.group('stats', short_help='Show statistics collected from past installations.')
+def cli():
+    """
+    Show statistics collected from past installations.
+    """
+    pass
+
+
+@cli.command('installs', short_help='Show the slowest IPS installation stages.')
+@click.option('-n', '--limit', default=15, help='Number of stages to show. (Default: 15)')
+@click.option('-v', '--version', 'versions', multiple=True,
+              help='Only include installations of this IPS version. May be given more than once.')
+@pass_context
+def installs(ctx, limit, versions):
+    """
+    Lists the slowest stages of completed IPS installations, averaged per IPS version. Each stage is compared with the
+    same stage of the closest older version, so stages that regress between releases stand out.
+    """
+    assert isinstance(ctx, Context)
+
+    reports = [r for r in InstallReport.load_all(ctx) if r.get('status') == 'complete']
+    if versions:
+        reports = [r for r in reports if r.get('version') in versions]
+    if not reports:
+        click.secho('No completed installation reports found', fg='red', bold=True, err=True)
+        return
+
+    # Stage totals by (stage, version)
+    totals = {}
+    for report in reports:
+        # The installer can return to a stage, so a report may list it more than once
+        stages = {}
+        for stage in report['stages']:
+            entry = stages.setdefault(stage['stage'], {'elapsed': 0.0, 'requests': 0, 'bytes': 0})
+            for key in entry:
+                entry[key] += stage[key]
+
+        for name, stage in stages.items():
+            entry = totals.setdefault((name, report['version']),
+                                      {'installs': 0, 'elapsed': 0.0, 'max': 0.0, 'requests': 0, 'bytes': 0})
+            entry['installs'] += 1
+            entry['elapsed'] += stage['elapsed']
+            entry['max'] = max(entry['max'], stage['elapsed'])
+            entry['requests'] += stage['requests']
+            entry['bytes'] += stage['bytes']
+
+    rows = []
+    ordered_versions = sorted({r['version'] for r in reports}, key=parse_version)
+    for (stage, version), entry in totals.items():
+        average = entry['elapsed'] / entry['installs']
+
+        # Compare with the closest older version that ran the same stage
+        change = None
+        for older in reversed(ordered_versions[:ordered_versions.index(version)]):
+            if (stage, older) in totals:
+                older_entry = totals[(stage, older)]
+                older_average = older_entry['elapsed'] / older_entry['installs']
+                change = (average - older_average) / older_average * 100 if older_average else None
+                break
+
+        rows.append((stage, version, entry['installs'], average, entry['max'], entry['requests'] / entry['installs'],
+                     entry['bytes'] / entry['installs'], change))
+
+    rows.sort(key=lambda row: row[3], reverse=True)
+    rows = rows[:limit]
+
+    swidth = max([len(row[0]) for row in rows] + [5])
+    vwidth = max([len(row[1]) for row in rows] + [7])
+    click.secho('{s:<{sw}}  {v:<{vw}}  {n:>5}  {a:>8}  {m:>8}  {r:>8}  {b:>9}  {c:>7}'.format(
+        s='Stage', sw=swidth, v='Version', vw=vwidth, n='Runs', a='Average', m='Max', r='Requests', b='Bytes',
+        c='Change'), bold=True)
+    for stage, version, count, average, maximum, requests, size, change in rows:
+        if change is None:
+            change_text = '{c:>7}'.format(c='-')
+        else:
+            change_text = click.style('{c:>+6.0f}%'.format(c=change), fg='red' if change > 10 else
+                                      ('green' if change < -10 else None))
+        click.echo('{s:<{sw}}  {v:<{vw}}  {n:>5}  {a:>7.2f}s  {m:>7.2f}s  {r:>8.0f}  {b:>9}  {c}'.format(
+            s=stage, sw=swidth, v=version, vw=vwidth, n=count, a=average, m=maximum, r=requests,
+            b=_format_size(size), c=change_text))
+
+    click.echo('------')
+    click.echo('{n} installations across {v} versions'.format(n=len(reports), v=len(ordered_versions)))
+
+
+def _format_size(size):
+    """
+    Format a byte count for display
+    @type   size:   float
+    @rtype: str
+    """
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '{s:.0f}{u}'.format(s=size, u=unit)
+        size /= 1024.0
+
+    return '{s:.1f}GB'.format(s=size)
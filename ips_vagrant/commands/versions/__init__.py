@@ -1,14 +1,18 @@
+import os
 import click
 import logging
 from ips_vagrant.downloaders import IpsManager
 from ips_vagrant.downloaders.dev_tools import DevToolsManager
 from ips_vagrant.cli import pass_context, Context
+from ips_vagrant.common.progress import Echo
 
 
 @click.command('versions', short_help='Displays available IPS and resource versions.')
 @click.argument('resource', default='ips', metavar='<resource>')
+@click.option('--reindex', is_flag=True, help='Rebuild the local archive index before listing versions.')
+@click.option('--verify', is_flag=True, help='Verify the integrity of all local archives.')
 @pass_context
-def cli(ctx, resource):
+def cli(ctx, resource, reindex, verify):
     """
     Displays all locally cached <resource> versions available for installation.
 
@@ -24,12 +28,38 @@ def cli(ctx, resource):
 
     if resource == 'ips':
         resource = IpsManager(ctx)
+        if reindex:
+            resource.reindex()
+        if verify:
+            return _verify(resource)
         for r in list(resource.versions.values()):
             click.secho(r.version.vstring, bold=True)
         return
 
     if resource in ('dev_tools', 'dev tools'):
         resource = DevToolsManager(ctx)
+        if reindex:
+            resource.reindex()
+        if verify:
+            return _verify(resource)
         for r in list(resource.versions.values()):
             click.secho('{v} ({id})'.format(v=r.version.vstring, id=r.version.vid), bold=True)
         return
+
+
+def _verify(resource):
+    """
+    Verify and display the integrity of all local archives
+    @type   resource:   ips_vagrant.downloaders.downloader.DownloadManager
+    """
+    p = Echo('Verifying local archives...')
+    results = resource.verify()
+    p.done()
+
+    statuses = {True: Echo.OK, False: Echo.FAIL, None: Echo.WARN}
+    for archive, verified in sorted(results.items()):
+        Echo(os.path.relpath(archive, resource.path)).done(statuses[verified])
+
+    if False in list(results.values()):
+        raise click.ClickException('One or more archives failed verification, re-download them with '
+                                   '"ipsv new --no-cache"')
@@ -1,10 +1,8 @@
-from distutils.version import StrictVersion, LooseVersion
 import os
 import click
 import logging
-import http.cookiejar
-import requests
 import ips_vagrant
+from hashlib import sha256
 from urllib.parse import urlparse
 from configparser import ConfigParser
 
@@ -77,6 +75,7 @@ def http_session(cookies=None):
     @type   cookies:    dict, cookielib.LWPCookieJar, None or False
     @rtype  requests.Session
     """
+    import requests
     session = requests.Session()
     if cookies is not False:
         session.cookies.update(cookies or cookiejar())
@@ -90,6 +89,7 @@ def cookiejar(name='session'):
     Ready the CookieJar, loading a saved session if available
     @rtype: cookielib.LWPCookieJar
     """
+    import http.cookiejar
     log = logging.getLogger('ipsv.common.cookiejar')
     spath = os.path.join(config().get('Paths', 'Data'), '{n}.txt'.format(n=name))
     cj = http.cookiejar.LWPCookieJar(spath)
@@ -104,6 +104,23 @@ def cookiejar(name='session'):
     return cj
 
 
+def file_digest(filepath, block_size=1048576):
+    """
+    Calculate the SHA-256 digest of a file
+    @type   filepath:   str
+    @param  block_size: Read buffer size in bytes
+    @type   block_size: int
+    @return:    Hex digest
+    @rtype:     str
+    """
+    digest = sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
 def parse_version(vstring):
     """
     StrictVersion / LooseVersion decorator method
@@ -111,6 +128,7 @@ def parse_version(vstring):
     @return:    StrictVersion if possible, otherwise LooseVersion
     @rtype:     StrictVersion or LooseVersion
     """
+    from distutils.version import StrictVersion, LooseVersion
     try:
         version = StrictVersion(vstring)
     except ValueError:
@@ -128,14 +146,3 @@ def unparse_version(vtuple):
     @rtype: str
     """
     return '.'.join(map(str, vtuple))
-
-
-def byteify(input):
-    if isinstance(input, dict):
-        return {byteify(key):byteify(value) for key,value in input.items()}
-    elif isinstance(input, list):
-        return [byteify(element) for element in input]
-    elif isinstance(input, str):
-        return input.encode('utf-8')
-    else:
-        return input
@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """
+    Get the shared asyncio event loop, starting it on a background thread on first use
+    @rtype: asyncio.AbstractEventLoop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='ipsv-event-loop', daemon=True).start()
+        return _loop
+
+
+def run(coro):
+    """
+    Run a coroutine on the shared event loop and wait for its result. Coroutines run from several threads (e.g. the
+    provision worker pool) all progress concurrently on the one loop.
+    @type   coro:   collections.abc.Coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, event_loop()).result()
@@ -0,0 +1,197 @@
+import re
+import logging
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from ips_vagrant.common import http_session
+
+
+class Browser(object):
+    """
+    Minimal stateful web browser for stepping through HTML form wizards. Every request, including Ajax requests, goes
+    through a single keep-alive Requests session, so connections and cookies are shared across the whole wizard.
+    """
+    def __init__(self, cookies=None, verify=True):
+        """
+        @param  cookies:    Cookies to load. None loads the app default CookieJar. False disables cookie loading.
+        @type   cookies:    dict, cookielib.LWPCookieJar, None or False
+        @param  verify:     Verify TLS certificates
+        @type   verify:     bool
+        """
+        self.log = logging.getLogger('ipsv.common.browser')
+        self.session = http_session(cookies)
+        self.verify = verify
+
+        self.response = None
+        self.soup = None
+        self.form = None
+
+    def open(self, url, method='get', data=None):
+        """
+        Load a page, making it the current page
+        @type   url:    str
+        @type   method: str
+        @param  data:   Form data for POST requests, or query parameters for GET requests
+        @type   data:   list, dict or None
+        @rtype: requests.Response
+        """
+        self.log.debug('Opening page: %s %s', method.upper(), url)
+        if method == 'post':
+            response = self.session.post(url, data=data, verify=self.verify)
+        else:
+            response = self.session.get(url, params=data, verify=self.verify)
+        response.raise_for_status()
+
+        self.response = response
+        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.form = None
+        return response
+
+    def request(self, url, method='get', params=None, ajax=False, timeout=None, data=None, allow_redirects=True):
+        """
+        Perform a request on the browser's session without leaving the current page
+        @type   url:                str
+        @type   method:             str
+        @type   params:             dict or None
+        @param  ajax:               Send the request as an XMLHttpRequest
+        @type   ajax:               bool
+        @param  timeout:            Seconds to wait for the server to respond
+        @type   timeout:            float or None
+        @param  data:               Form data to send in the request body
+        @type   data:               list, dict or None
+        @param  allow_redirects:    Follow redirects
+        @type   allow_redirects:    bool
+        @rtype: requests.Response
+        """
+        headers = {'X-Requested-With': 'XMLHttpRequest'} if ajax else None
+        return self.session.request(method, url, params, data, headers=headers, verify=self.verify, timeout=timeout,
+                                    allow_redirects=allow_redirects)
+
+    def title(self):
+        """
+        Get the current page's title
+        @rtype: str or None
+        """
+        if self.soup is None or self.soup.title is None or self.soup.title.string is None:
+            return None
+
+        return self.soup.title.string.strip()
+
+    def links(self, text_regex=None):
+        """
+        Iterate over the absolute URLs of the links on the current page
+        @param  text_regex: Only yield links whose text matches this pattern
+        @type   text_regex: str or None
+        @rtype: collections.Iterable[str]
+        """
+        pattern = re.compile(text_regex) if text_regex else None
+        for a in self.soup.find_all('a', href=True):
+            if pattern is None or pattern.search(a.get_text()):
+                yield urljoin(self.response.url, a['href'])
+
+    def follow_link(self, url):
+        """
+        Open a link found with links()
+        @type   url:    str
+        @rtype: requests.Response
+        """
+        return self.open(url)
+
+    def select_form(self, nr=0):
+        """
+        Select a form on the current page to fill in and submit
+        @param  nr: Index of the form on the page
+        @type   nr: int
+        @rtype: Form
+        """
+        forms = self.soup.find_all('form')
+        if nr >= len(forms):
+            raise BrowserError('No form #{nr} on the current page ({u})'.format(nr=nr, u=self.response.url))
+
+        self.form = Form(forms[nr], self.response.url)
+        return self.form
+
+    def submit(self):
+        """
+        Submit the selected form
+        @rtype: requests.Response
+        """
+        if self.form is None:
+            raise BrowserError('No form has been selected')
+
+        return self.open(self.form.action, self.form.method, self.form.data())
+
+
+class Form(object):
+    """
+    HTML form, with its fields pre-filled the way a browser would submit them untouched
+    """
+    IGNORED_INPUTS = ('submit', 'image', 'button', 'reset', 'file')
+
+    def __init__(self, tag, url):
+        """
+        @param  tag:    Form element
+        @type   tag:    bs4.element.Tag
+        @param  url:    URL of the page the form is on
+        @type   url:    str
+        """
+        self.action = urljoin(url, tag.get('action') or url)
+        self.method = (tag.get('method') or 'get').lower()
+        self.fields = []
+        self.checkboxes = {}
+
+        for control in tag.find_all(['input', 'select', 'textarea', 'button']):
+            name = control.get('name')
+            if not name or control.has_attr('disabled'):
+                continue
+
+            if control.name == 'select':
+                options = control.find_all('option')
+                selected = [o for o in options if o.has_attr('selected')] or options[:1]
+                self.fields.extend((name, o.get('value', o.get_text())) for o in selected)
+            elif control.name == 'textarea':
+                self.fields.append((name, control.get_text()))
+            elif control.name == 'input' and control.get('type', 'text').lower() in ('checkbox', 'radio'):
+                self.checkboxes.setdefault(name, control.get('value', 'on'))
+                if control.has_attr('checked'):
+                    self.fields.append((name, control.get('value', 'on')))
+            elif control.name == 'input' and control.get('type', 'text').lower() not in self.IGNORED_INPUTS:
+                self.fields.append((name, control.get('value', '')))
+
+        # Submitting a form clicks its first submit button, which is sent with the form if it's named
+        button = tag.find(lambda t: (t.name == 'button' and t.get('type', 'submit').lower() == 'submit') or
+                          (t.name == 'input' and t.get('type', '').lower() in ('submit', 'image')))
+        self.button = (button['name'], button.get('value', '')) if button and button.get('name') else None
+
+    def __getitem__(self, name):
+        for field, value in self.fields:
+            if field == name:
+                return value
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        self.fields = [(f, v) for f, v in self.fields if f != name]
+        self.fields.append((name, value))
+
+    def check(self, name, checked=True):
+        """
+        Check or uncheck a checkbox
+        @type   name:       str
+        @type   checked:    bool
+        """
+        if name not in self.checkboxes:
+            raise BrowserError('No such checkbox: {n}'.format(n=name))
+
+        self.fields = [(f, v) for f, v in self.fields if f != name]
+        if checked:
+            self.fields.append((name, self.checkboxes[name]))
+
+    def data(self):
+        """
+        Get the form data to submit
+        @rtype: list of tuple of (str, str)
+        """
+        return self.fields + ([self.button] if self.button else [])
+
+
+class BrowserError(Exception):
+    pass
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import logging
+from hashlib import sha1
+
+
+class HttpCache(object):
+    """
+    TTL cache for scraped HTTP pages, revalidated with conditional requests once expired. Pages are cached per login
+    identity, as the pages we scrape depend on the account the session is logged in to.
+    """
+    def __init__(self, session, path, ttl, refresh=False, identity=None):
+        """
+        @param  session:    Session to submit requests with
+        @type   session:    requests.Session
+        @param  path:       Cache directory
+        @type   path:       str
+        @param  ttl:        Seconds a cached response is used without revalidation
+        @type   ttl:        int
+        @param  refresh:    Ignore cached responses and fetch every page again
+        @type   refresh:    bool
+        @param  identity:   Login identity the session is authenticated as, or None for an anonymous session
+        @type   identity:   str or None
+        """
+        self.session = session
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.identity = sha1(identity.encode('utf-8')).hexdigest() if identity else None
+        self.log = logging.getLogger('ipsv.common.cache')
+
+    def _entry_path(self, url):
+        """
+        Get the cache file path for a URL, as fetched by our login identity
+        @type   url:    str
+        @rtype: str
+        """
+        key = '{i}:{u}'.format(i=self.identity, u=url) if self.identity else url
+        return os.path.join(self.path, '{h}.json'.format(h=sha1(key.encode('utf-8')).hexdigest()))
+
+    def _load(self, url):
+        """
+        Load a cache entry
+        @type   url:    str
+        @rtype: dict or None
+        """
+        entry_path = self._entry_path(url)
+        if not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError) as e:
+            self.log.warn('Unreadable cache entry, ignoring it (%s): %s', str(e), entry_path)
+            return None
+
+        return entry if entry.get('url') == url and entry.get('identity') == self.identity else None
+
+    def _save(self, entry):
+        """
+        Write a cache entry
+        @type   entry:  dict
+        """
+        entry_path = self._entry_path(entry['url'])
+        tmp_path = '{p}.tmp'.format(p=entry_path)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0o700)
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError) as e:
+            self.log.warn('Unable to write cache entry (%s): %s', str(e), entry_path)
+
+    def get(self, url):
+        """
+        Get a page, from the cache if possible
+        @type   url:    str
+        @rtype: requests.Response or CachedResponse
+        """
+        entry = None if self.refresh else self._load(url)
+        if entry and (time.time() - entry['fetched']) < self.ttl:
+            self.log.debug('Using cached response: %s', url)
+            return CachedResponse(entry)
+
+        # Revalidate an expired entry rather than downloading the whole page again
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.session.get(url, headers=headers)
+        self.log.debug('Response code: %s', response.status_code)
+        if entry and response.status_code == 304:
+            self.log.debug('Cached response is still valid: %s', url)
+            entry['fetched'] = time.time()
+            self._save(entry)
+            return CachedResponse(entry)
+
+        if response.status_code == 200:
+            self._save({
+                'url': url,
+                'identity': self.identity,
+                'fetched': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'text': response.text
+            })
+
+        return response
+
+
+class CachedResponse(object):
+    """
+    Cached response container, mirroring the parts of requests.Response our scrapers use
+    """
+    status_code = 200
+
+    def __init__(self, entry):
+        """
+        @type   entry:  dict
+        """
+        self.url = entry['url']
+        self.text = entry['text']
+
+    def raise_for_status(self):
+        """
+        Only successful responses are cached, so there is never anything to raise
+        """
+        pass
@@ -0,0 +1,115 @@
+import os
+import stat
+import fcntl
+import shutil
+import logging
+from ips_vagrant.common.extract import create_file, resolve_workers, run_batches, BUFFER_SIZE
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+class TreeCloner(object):
+    """
+    Clones a directory tree file by file, sharing file contents with the source where the filesystem allows it
+    """
+    def __init__(self, src, link='reflink', workers=1):
+        """
+        @param  src:        Source directory
+        @type   src:        str
+        @param  link:       How files are cloned: reflink (falls back to copy), hardlink or copy
+        @type   link:       str
+        @param  workers:    Number of files cloned in parallel, or 0 for one per CPU core
+        @type   workers:    int
+        """
+        self.src = src
+        self.link = link
+        self.workers = resolve_workers(workers)
+        self.log = logging.getLogger('ipsv.common.clone')
+
+    def clone(self, dest, mode=None, progress=None, copy=None):
+        """
+        Clone the source tree into a destination directory
+        @param  dest:       Destination directory
+        @type   dest:       str
+        @param  mode:       Callable returning the permissions for a (relative path, is directory) pair, or None to
+                            keep the source permissions. Not applied to hardlinked files.
+        @type   mode:       callable or None
+        @param  progress:   Progress bar to wrap file batch completion in
+        @type   progress:   ips_vagrant.common.progress.ProgressBar or None
+        @param  copy:       Callable returning True for relative file paths that must never be hardlinked
+        @type   copy:       callable or None
+        """
+        # Directories are all created during the walk, so files can then be cloned in any order
+        mode = mode or (lambda path, is_dir: None)
+        copy = copy or (lambda path: False)
+        if not os.path.isdir(dest):
+            os.makedirs(dest, stat.S_IMODE(os.stat(self.src).st_mode))
+
+        files = []
+        for dirname, dirnames, filenames in os.walk(self.src):
+            relpath = os.path.relpath(dirname, self.src)
+            relpath = '' if relpath == '.' else relpath
+            for filepath in dirnames:
+                dir_path = os.path.join(dest, relpath, filepath)
+                dir_mode = mode(os.path.join(relpath, filepath), True)
+                if dir_mode is None:
+                    dir_mode = stat.S_IMODE(os.stat(os.path.join(dirname, filepath)).st_mode)
+
+                if not os.path.exists(dir_path):
+                    self.log.debug('Creating directory: %s', dir_path)
+                    os.mkdir(dir_path)
+                os.chmod(dir_path, dir_mode)
+
+            for filepath in filenames:
+                file_relpath = os.path.join(relpath, filepath)
+                files.append((os.path.join(dirname, filepath), os.path.join(dest, file_relpath),
+                              mode(file_relpath, False), copy(file_relpath)))
+
+        run_batches(self._clone_files, files, self.workers, progress)
+        self.log.info('%s cloned to: %s', self.src, dest)
+
+    def _clone_files(self, files):
+        """
+        Clone a batch of files
+        @param  files:  List of (source path, destination path, permissions, always copy) tuples
+        @type   files:  list of tuple
+        """
+        for src, dst, mode, force_copy in files:
+            self._clone(src, dst, mode, force_copy)
+
+    def _clone(self, src, dst, mode=None, force_copy=False):
+        """
+        Clone a single file, falling back to a plain copy when the preferred method is unavailable
+        @type   src:        str
+        @type   dst:        str
+        @param  mode:       File permissions (Default: the source file's permissions)
+        @type   mode:       int or None
+        @param  force_copy: Never hardlink this file
+        @type   force_copy: bool
+        """
+        if self.link == 'hardlink' and not force_copy:
+            # Hardlinked files share their contents (and permissions) with the source
+            try:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                os.link(src, dst)
+                return
+            except OSError as e:
+                self.log.info('Unable to create hardlinks (%s), falling back to copies', str(e))
+                self.link = 'copy'
+
+        with open(src, 'rb') as s:
+            if mode is None:
+                mode = stat.S_IMODE(os.fstat(s.fileno()).st_mode)
+
+            with os.fdopen(create_file(dst, mode), 'wb') as d:
+                if self.link == 'reflink':
+                    try:
+                        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                        return
+                    except (IOError, OSError) as e:
+                        self.log.info('Unable to create reflinks (%s), falling back to copies', str(e))
+                        self.link = 'copy'
+
+                shutil.copyfileobj(s, d, BUFFER_SIZE)
@@ -0,0 +1,203 @@
+import os
+import re
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from zipfile import ZipFile, BadZipfile
+
+# Copy buffer size in bytes
+BUFFER_SIZE = 1048576
+
+DEFAULT_DIR_MODE = 0o755
+DEFAULT_FILE_MODE = 0o644
+
+# Number of files handed to a worker at a time
+BATCH_SIZE = 64
+
+
+def create_file(path, mode=None):
+    """
+    Create a new file with exact permissions, replacing any existing file rather than writing through it
+    @type   path:   str
+    @param  mode:   File permissions (Default: 0644)
+    @type   mode:   int or None
+    @return:    File descriptor opened for writing
+    @rtype:     int
+    """
+    mode = DEFAULT_FILE_MODE if mode is None else mode
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+    try:
+        fd = os.open(path, flags, mode)
+    except FileExistsError:
+        # The existing file may be a hardlink we must not modify, so replace it instead of truncating it
+        os.remove(path)
+        fd = os.open(path, flags, mode)
+
+    # Permissions passed to open() are subject to the umask
+    os.fchmod(fd, mode)
+    return fd
+
+
+def resolve_workers(workers):
+    """
+    Resolve a configured worker count
+    @param  workers:    Number of workers, or 0 for one per CPU core
+    @type   workers:    int
+    @rtype: int
+    """
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def run_batches(func, items, workers=1, progress=None):
+    """
+    Run a function over batches of items, on a thread pool if more than one worker is requested.
+    The progress bar is only ever updated from the calling thread, as each batch completes.
+    @param  func:       Callable accepting a list of items
+    @type   func:       callable
+    @type   items:      list
+    @type   workers:    int
+    @param  progress:   Progress bar to wrap batch completion in
+    @type   progress:   ips_vagrant.common.progress.ProgressBar or None
+    """
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    if workers <= 1:
+        for batch in (progress(batches) if progress else batches):
+            func(batch)
+        return
+
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(func, batch) for batch in batches]
+        try:
+            completed = as_completed(futures)
+            for future in (progress(completed) if progress else completed):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+class ZipExtractor(object):
+    """
+    Single pass zip extractor, streaming members straight to their destination
+    """
+    def __init__(self, archive, pattern, workers=1):
+        """
+        @param  archive:    Zip archive path
+        @type   archive:    str
+        @param  pattern:    Regular expression the archive's top level setup directory must match
+        @type   pattern:    str
+        @param  workers:    Number of files extracted in parallel, or 0 for one per CPU core
+        @type   workers:    int
+        """
+        self.archive = archive
+        self.pattern = pattern
+        self.workers = resolve_workers(workers)
+        self.log = logging.getLogger('ipsv.common.extract')
+
+        # Each worker thread reads through its own archive handle
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    def extract(self, dest, mode=None, progress=None):
+        """
+        Extract the contents of the archive's setup directory into a destination directory
+        @param  dest:       Destination directory
+        @type   dest:       str
+        @param  mode:       Callable returning the permissions for a (relative path, is directory) pair, or None for
+                            the defaults
+        @type   mode:       callable or None
+        @param  progress:   Progress bar to wrap file batch completion in
+        @type   progress:   ips_vagrant.common.progress.ProgressBar or None
+        """
+        mode = mode or (lambda path, is_dir: None)
+        with ZipFile(self.archive) as z:
+            members = z.infolist()
+
+        prefix = members[0].filename
+        if re.match(self.pattern, prefix):
+            self.log.debug('Setup directory matched: %s', prefix)
+        else:
+            self.log.error('No setup directory matched, unable to continue')
+            raise BadZipfile('Unrecognized setup file format, aborting')
+
+        # Directories are all created up front, so files can then be written in any order
+        self.log.info('Extracting %s to %s (%d workers)', self.archive, dest, self.workers)
+        created = set()
+        files = []
+        for member in members:
+            if not member.filename.startswith(prefix):
+                raise BadZipfile('Archive member outside of the setup directory: {m}'.format(m=member.filename))
+
+            path = member.filename[len(prefix):]
+            if not path or '..' in path.split('/'):
+                continue
+
+            if member.is_dir():
+                self._makedirs(dest, path.rstrip('/'), mode, created)
+                continue
+
+            self._makedirs(dest, os.path.dirname(path), mode, created)
+            files.append((member, os.path.join(dest, path), mode(path, False)))
+
+        try:
+            run_batches(self._extract_files, files, self.workers, progress)
+        finally:
+            for handle in self._handles:
+                handle.close()
+            self._handles = []
+            self._local = threading.local()
+
+        self.log.info('Setup files extracted to: %s', dest)
+
+    def _zipfile(self):
+        """
+        Get the current thread's archive handle
+        @rtype: ZipFile
+        """
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            handle = self._local.handle = ZipFile(self.archive)
+            with self._lock:
+                self._handles.append(handle)
+
+        return handle
+
+    def _extract_files(self, files):
+        """
+        Extract a batch of files
+        @param  files:  List of (member, destination path, permissions) tuples
+        @type   files:  list of tuple
+        """
+        z = self._zipfile()
+        for member, path, file_mode in files:
+            fd = create_file(path, file_mode)
+            with os.fdopen(fd, 'wb') as f, z.open(member) as src:
+                shutil.copyfileobj(src, f, BUFFER_SIZE)
+
+    def _makedirs(self, dest, path, mode, created):
+        """
+        Create a directory and any missing parents, applying permissions to each directory created
+        @type   dest:       str
+        @param  path:       Directory path relative to dest
+        @type   path:       str
+        @type   mode:       callable
+        @param  created:    Directories already created by this extraction
+        @type   created:    set
+        """
+        if not path or path in created:
+            return
+
+        self._makedirs(dest, os.path.dirname(path), mode, created)
+        dir_path = os.path.join(dest, path)
+        dir_mode = mode(path, True)
+        if not os.path.isdir(dir_path):
+            self.log.debug('Creating directory: %s', dir_path)
+            os.mkdir(dir_path)
+            os.chmod(dir_path, DEFAULT_DIR_MODE if dir_mode is None else dir_mode)
+        elif dir_mode is not None:
+            os.chmod(dir_path, dir_mode)
+
+        created.add(path)
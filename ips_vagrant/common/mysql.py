@@ -0,0 +1,418 @@
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import random
+import string
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import URL
+from sqlalchemy.sql import text
+from ips_vagrant.common import config as load_config
+
+# mysql_com.h client flags, so a batch of statements can be sent in a single round trip
+CLIENT_MULTI_STATEMENTS = 1 << 16
+CLIENT_MULTI_RESULTS = 1 << 17
+
+
+def random_password():
+    """
+    Generate a random MySQL user password
+    @rtype: str
+    """
+    return ''.join(random.SystemRandom()
+                   .choice(string.ascii_letters + string.digits) for _ in range(random.randint(16, 24)))
+
+
+def quote_identifier(name):
+    """
+    Quote a MySQL database, table or column name
+    @type   name:   str
+    @rtype: str
+    """
+    return '`{n}`'.format(n=name.replace('`', '``'))
+
+
+def quote_string(value):
+    """
+    Quote a MySQL string literal
+    @type   value:  str
+    @rtype: str
+    """
+    return "'{v}'".format(v=value.replace('\\', '\\\\').replace("'", "\\'"))
+
+
+class MysqlAdmin(object):
+    """
+    Shared MySQL administrator connection pool, configured from the [MySQL] section of ipsv.conf. Statements that
+    create or drop several databases and users are sent to the server as a single batch.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, url, connections=5):
+        """
+        @param  url:            Administrator connection URL
+        @type   url:            sqlalchemy.engine.url.URL
+        @param  connections:    Number of connections kept open in the pool
+        @type   connections:    int
+        """
+        self.url = url
+        self.log = logging.getLogger('ipsv.common.mysql')
+        self.engine = create_engine(url, pool_size=connections, pool_recycle=3600,
+                                    connect_args={'client_flag': CLIENT_MULTI_STATEMENTS | CLIENT_MULTI_RESULTS})
+
+    @classmethod
+    def get(cls, config=None):
+        """
+        Get the shared administrator connection pool for a configuration
+        @param  config: Configuration to read the [MySQL] settings from (Default: the system configuration)
+        @type   config: configparser.ConfigParser or None
+        @rtype: MysqlAdmin
+        """
+        config = config or load_config()
+        settings = (config.get('MySQL', 'User'), config.get('MySQL', 'Password'), config.get('MySQL', 'Host'),
+                    config.getint('MySQL', 'Port'))
+
+        with cls._instances_lock:
+            if settings not in cls._instances:
+                user, password, host, port = settings
+                url = URL('mysql', username=user, password=password or None, host=host, port=port)
+                cls._instances[settings] = cls(url, config.getint('MySQL', 'Connections'))
+            return cls._instances[settings]
+
+    def connect(self):
+        """
+        Check out a connection from the pool
+        @rtype: sqlalchemy.engine.Connection
+        """
+        return self.engine.connect()
+
+    def execute(self, statement, *args, **kwargs):
+        """
+        Execute a single statement on a pooled connection
+        @type   statement:  str or sqlalchemy.sql.expression.TextClause
+        @rtype: sqlalchemy.engine.ResultProxy
+        """
+        return self.engine.execute(statement, *args, **kwargs)
+
+    def execute_batch(self, statements):
+        """
+        Send several statements to the server in a single round trip. MySQL commits DDL statements implicitly, so
+        when a statement fails, the statements before it have already been applied.
+        @type   statements: list of str
+        """
+        if not statements:
+            return
+
+        self.log.debug('Executing %d statements in one batch', len(statements))
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(';\n'.join(statements))
+            # Each statement's error is only raised when its result is reached
+            while cursor.nextset():
+                pass
+            cursor.close()
+        except Exception:
+            # Don't hand a connection with half a batch (or changed session settings) back to the pool
+            conn.invalidate()
+            raise
+        finally:
+            conn.close()
+
+    def existing_databases(self, db_names):
+        """
+        Get which of the given databases exist
+        @type   db_names:   list of str
+        @rtype: set of str
+        """
+        if not db_names:
+            return set()
+
+        query = 'SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME IN ({dbs})'\
+            .format(dbs=', '.join(quote_string(db_name) for db_name in db_names))
+        return {row[0] for row in self.execute(query)}
+
+    def database_exists(self, db_name):
+        """
+        Check whether a MySQL database exists
+        @type   db_name:    str
+        @rtype: bool
+        """
+        return db_name in self.existing_databases([db_name])
+
+    def create_databases(self, databases, drop_existing=False):
+        """
+        Create MySQL databases, each with a user granted access to it, in a single round trip
+        @param  databases:      Database name, user and password tuples
+        @type   databases:      list of tuple of (str, str, str)
+        @param  drop_existing:  Drop any previous databases and users first
+        @type   drop_existing:  bool
+        """
+        if not databases:
+            return
+
+        statements = []
+        if drop_existing:
+            statements.extend(self._drop_statements([(db_name, db_user) for db_name, db_user, __ in databases]))
+
+        for db_name, db_user, db_pass in databases:
+            self.log.info('Creating database: %s', db_name)
+            statements.append('CREATE DATABASE {db}'.format(db=quote_identifier(db_name)))
+            statements.append("GRANT ALL ON {db}.* TO {u}@'localhost' IDENTIFIED BY {p}"
+                              .format(db=quote_identifier(db_name), u=quote_string(db_user), p=quote_string(db_pass)))
+
+        self.execute_batch(statements)
+
+    def drop_databases(self, databases):
+        """
+        Drop MySQL databases and their users in a single round trip
+        @param  databases:  Database name and user tuples (the user may be None)
+        @type   databases:  list of tuple of (str, str or None)
+        """
+        self.execute_batch(self._drop_statements(databases))
+
+    def _drop_statements(self, databases):
+        """
+        Build the statements dropping databases and their users
+        @param  databases:  Database name and user tuples (the user may be None)
+        @type   databases:  list of tuple of (str, str or None)
+        @rtype: list of str
+        """
+        statements = []
+        for db_name, __ in databases:
+            self.log.info('Dropping database: %s', db_name)
+            statements.append('DROP DATABASE IF EXISTS {db}'.format(db=quote_identifier(db_name)))
+
+        # DROP USER fails for missing users, and older servers have no DROP USER IF EXISTS
+        users = [db_user for __, db_user in databases if db_user]
+        if users:
+            query = "SELECT User FROM mysql.user WHERE Host = 'localhost' AND User IN ({u})"\
+                .format(u=', '.join(quote_string(db_user) for db_user in users))
+            existing = {row[0] for row in self.execute(query)}
+            statements.extend("DROP USER {u}@'localhost'".format(u=quote_string(db_user))
+                              for db_user in sorted(set(users)) if db_user in existing)
+
+        return statements
+
+    def tables(self, db_name):
+        """
+        Get the names of a MySQL database's tables
+        @type   db_name:    str
+        @rtype: list of str
+        """
+        return [row[0] for row in self.execute(
+            text("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = :db "
+                 "AND TABLE_TYPE = 'BASE TABLE'"), db=db_name
+        )]
+
+    def copy_database(self, src_db, dest_db):
+        """
+        Copy every table of a MySQL database into another, entirely server-side
+        @param  src_db:     Source database name
+        @type   src_db:     str
+        @param  dest_db:    Destination database name (must already exist)
+        @type   dest_db:    str
+        """
+        tables = self.tables(src_db)
+
+        # Rows are copied exactly as they are, so there's nothing for the server to check
+        statements = ['SET SESSION foreign_key_checks = 0, unique_checks = 0']
+        for table in tables:
+            src, dest = [quote_identifier(db) + '.' + quote_identifier(table) for db in (src_db, dest_db)]
+            statements.append('CREATE TABLE {d} LIKE {s}'.format(d=dest, s=src))
+            statements.append('INSERT INTO {d} SELECT * FROM {s}'.format(d=dest, s=src))
+        statements.append('SET SESSION foreign_key_checks = 1, unique_checks = 1')
+
+        self.execute_batch(statements)
+        self.log.info('%d tables copied from %s to %s', len(tables), src_db, dest_db)
+
+
+class DatabasePool(object):
+    """
+    Pool of pre-created, empty MySQL databases with their users already granted access, so new sites can claim a
+    database instead of waiting on DDL statements. The pool is refilled by a detached background process.
+
+    Pooled databases aren't named after the site that claims them, so each claim is recorded against its owner, for
+    a later installation of the same site to find a database left over from a previous one.
+    """
+    FILENAME = 'mysql_pool.json'
+    CLAIMS_FILENAME = 'mysql_claims.json'
+
+    def __init__(self, path, size, config_path=None):
+        """
+        @param  path:           Data directory the pool registry is kept in
+        @type   path:           str
+        @param  size:           Number of databases to keep in the pool (0 to disable the pool)
+        @type   size:           int
+        @param  config_path:    Configuration file to read the [MySQL] settings from, on top of the system
+                                configuration
+        @type   config_path:    str or None
+        """
+        self.path = path
+        self.size = size
+        self.config_path = config_path
+        self.registry_path = os.path.join(path, self.FILENAME)
+        self.claims_path = os.path.join(path, self.CLAIMS_FILENAME)
+        self.log = logging.getLogger('ipsv.common.mysql')
+
+        config = load_config()
+        if config_path:
+            config.read(config_path)
+        self.mysql = MysqlAdmin.get(config)
+
+    @contextmanager
+    def _lock(self, name='registry', blocking=True):
+        """
+        Hold one of the pool's file locks
+        @param  name:       Lock name
+        @type   name:       str
+        @param  blocking:   Wait for the lock, instead of yielding False if it is already held
+        @type   blocking:   bool
+        @rtype: bool
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o755, exist_ok=True)
+
+        with open('{p}.{n}.lock'.format(p=self.registry_path, n=name), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, path=None, default=list):
+        """
+        Load the pooled databases, or the recorded claims. Must be called while holding the registry lock.
+        @param  path:       Registry file (Default: the pooled databases)
+        @type   path:       str or None
+        @param  default:    Factory for the value returned if the file is missing or unreadable
+        @type   default:    type
+        @rtype: list of dict or dict
+        """
+        path = path or self.registry_path
+        if not os.path.isfile(path):
+            return default()
+
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            self.log.warn('Unreadable database pool registry, discarding it (%s): %s', str(e), path)
+            return default()
+
+    def _save(self, databases, path=None):
+        """
+        Save the pooled databases, or the recorded claims. Must be called while holding the registry lock.
+        @type   databases:  list of dict or dict
+        @param  path:       Registry file (Default: the pooled databases)
+        @type   path:       str or None
+        """
+        path = path or self.registry_path
+        tmp_path = '{p}.tmp'.format(p=path)
+        with open(tmp_path, 'w') as f:
+            json.dump(databases, f, indent=2)
+        os.chmod(tmp_path, 0o600)
+        os.rename(tmp_path, path)
+
+    def claim(self, owner=None):
+        """
+        Claim a pooled database, removing it from the pool
+        @param  owner:  Key of the site claiming the database, to record the claim against
+        @type   owner:  str or None
+        @return:    Database name, user and password, or None if the pool is empty
+        @rtype:     tuple of (str, str, str) or None
+        """
+        if self.size <= 0:
+            return None
+
+        while True:
+            with self._lock():
+                databases = self._load()
+                if not databases:
+                    self.log.info('Database pool is empty')
+                    return None
+
+                database = databases.pop(0)
+                self._save(databases)
+
+            # Pooled databases may have been dropped by hand since they were created
+            if self.mysql.database_exists(database['db_name']):
+                self.log.info('Claimed pooled database: %s', database['db_name'])
+                if owner:
+                    with self._lock():
+                        claims = self._load(self.claims_path, dict)
+                        claims[owner] = {'db_name': database['db_name'], 'db_user': database['db_user']}
+                        self._save(claims, self.claims_path)
+                return database['db_name'], database['db_user'], database['db_pass']
+
+            self.log.warn('Pooled database no longer exists, discarding it: %s', database['db_name'])
+
+    def claimed(self, owners):
+        """
+        Get the databases recorded as claimed by sites
+        @param  owners: Keys of the sites
+        @type   owners: list of str
+        @return:    Database name and user tuples, by site key
+        @rtype:     dict
+        """
+        with self._lock():
+            claims = self._load(self.claims_path, dict)
+
+        return {owner: (claims[owner]['db_name'], claims[owner]['db_user']) for owner in owners if owner in claims}
+
+    def refill(self):
+        """
+        Create databases until the pool is full. Only one refill runs at a time.
+        """
+        with self._lock('refill', blocking=False) as locked:
+            if not locked:
+                self.log.debug('Database pool is already being refilled')
+                return
+
+            with self._lock():
+                missing = self.size - len(self._load())
+            if missing <= 0:
+                return
+
+            # Pooled databases are named like any other site database, as sites keep the name they claim
+            databases = []
+            for __ in range(missing):
+                token = uuid.uuid4().hex
+                databases.append({'db_name': 'ipsv_{t}'.format(t=token), 'db_user': 'ipsv_{t}'.format(t=token[:11]),
+                                  'db_pass': random_password(), 'created': int(time.time())})
+            self.log.info('Adding %d databases to the pool', missing)
+            self.mysql.create_databases([(db['db_name'], db['db_user'], db['db_pass']) for db in databases])
+
+            with self._lock():
+                self._save(self._load() + databases)
+
+    def refill_async(self):
+        """
+        Refill the pool from a detached background process
+        """
+        if self.size <= 0:
+            return
+
+        self.log.debug('Refilling the database pool in the background')
+        with open(os.devnull, 'w') as devnull:
+            args = [sys.executable, '-m', 'ips_vagrant.common.mysql', self.path, str(self.size)]
+            if self.config_path:
+                args.append(self.config_path)
+            subprocess.Popen(args, stdin=devnull, stdout=devnull, stderr=devnull, close_fds=True,
+                             start_new_session=True)
+
+
+if __name__ == '__main__':
+    DatabasePool(sys.argv[1], int(sys.argv[2]), sys.argv[3] if len(sys.argv) > 3 else None).refill()
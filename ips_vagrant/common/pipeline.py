@@ -0,0 +1,204 @@
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ips_vagrant.common.progress import Echo, quiet
+
+
+class Stage(object):
+    """
+    Pipeline stage
+    """
+    def __init__(self, name, func, requires=(), label=None, inline=False):
+        """
+        @param  name:       Stage name
+        @type   name:       str
+        @param  func:       Callable run for this stage, its return value is stored as the stage result
+        @type   func:       callable
+        @param  requires:   Names of the stages that must complete first
+        @type   requires:   tuple of str
+        @param  label:      Status message printed when the stage completes (or a callable returning one)
+        @type   label:      str or callable or None
+        @param  inline:     Run on the calling thread with output enabled, instead of quietly on a worker thread
+        @type   inline:     bool
+        """
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.label = label
+        self.inline = inline
+        self.result = None
+        self.start = None
+        self.end = None
+
+    @property
+    def elapsed(self):
+        """
+        Seconds spent running this stage
+        @rtype: float
+        """
+        if self.start is None or self.end is None:
+            return 0.0
+
+        return self.end - self.start
+
+
+class Pipeline(object):
+    """
+    Dependency-aware stage scheduler, running every stage as soon as the stages it requires have completed
+    """
+    def __init__(self, workers=None):
+        """
+        @param  workers:    Maximum number of stages run concurrently (Default: one per stage)
+        @type   workers:    int or None
+        """
+        self.workers = workers
+        self.stages = OrderedDict()
+        self.start = None
+        self.end = None
+        self.log = logging.getLogger('ipsv.common.pipeline')
+
+    def __getitem__(self, name):
+        """
+        Get the result of a completed stage
+        @type   name:   str
+        """
+        return self.stages[name].result
+
+    def add(self, name, func, requires=(), label=None, inline=False):
+        """
+        Add a stage. Required stages must have been added first, so the stages can never form a cycle.
+        @type   name:       str
+        @type   func:       callable
+        @type   requires:   tuple of str
+        @type   label:      str or callable or None
+        @type   inline:     bool
+        @rtype: Stage
+        """
+        if name in self.stages:
+            raise PipelineError('Duplicate stage: {n}'.format(n=name))
+
+        unknown = [r for r in requires if r not in self.stages]
+        if unknown:
+            raise PipelineError('Stage {n} requires unknown stages: {u}'.format(n=name, u=', '.join(unknown)))
+
+        stage = Stage(name, func, requires, label, inline)
+        self.stages[name] = stage
+        return stage
+
+    def run(self):
+        """
+        Run every stage. If a stage fails, no further stages are started and its exception is raised once the
+        stages already running have finished.
+        """
+        self.start = time.time()
+        pending = list(self.stages.values())
+        running = {}
+        done = set()
+
+        with ThreadPoolExecutor(self.workers or max(len(pending), 1)) as pool:
+            try:
+                while pending or running:
+                    ready = [s for s in pending if all(r in done for r in s.requires)]
+                    for stage in [s for s in ready if not s.inline]:
+                        self.log.debug('Starting stage: %s', stage.name)
+                        pending.remove(stage)
+                        running[pool.submit(self._run, stage)] = stage
+
+                    # Inline stages run one at a time, after any background stages that became ready with them
+                    inline = [s for s in ready if s.inline]
+                    if inline:
+                        stage = inline[0]
+                        self.log.debug('Starting inline stage: %s', stage.name)
+                        pending.remove(stage)
+                        self._complete(stage, lambda: self._run(stage))
+                        done.add(stage.name)
+                        continue
+
+                    finished, __ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        stage = running.pop(future)
+                        self._complete(stage, future.result)
+                        done.add(stage.name)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+            finally:
+                self.end = time.time()
+
+    def _run(self, stage):
+        """
+        Run a single stage, quietly unless it is an inline stage
+        @type   stage:  Stage
+        """
+        stage.start = time.time()
+        try:
+            if stage.inline:
+                stage.result = stage.func()
+            else:
+                with quiet():
+                    stage.result = stage.func()
+        finally:
+            stage.end = time.time()
+            self.log.info('Stage %s finished in %.2fs', stage.name, stage.elapsed)
+
+    def _complete(self, stage, result):
+        """
+        Collect a stage's result and report its status from the calling thread
+        @type   stage:  Stage
+        @param  result: Callable that raises the stage's exception if it failed
+        @type   result: callable
+        """
+        try:
+            result()
+        except Exception:
+            self.log.exception('Stage %s failed', stage.name)
+            if stage.label:
+                p = Echo(self._label(stage))
+                p.done(p.FAIL)
+            raise
+
+        if stage.label:
+            Echo(self._label(stage)).done()
+
+    def _label(self, stage):
+        """
+        Get a stage's status message
+        @type   stage:  Stage
+        @rtype: str
+        """
+        return stage.label() if callable(stage.label) else stage.label
+
+    def critical_path(self):
+        """
+        Get the chain of stages that determined the total run time, following the latest finishing requirement
+        back from the stage that finished last
+        @rtype: list of Stage
+        """
+        stages = [s for s in self.stages.values() if s.end is not None]
+        if not stages:
+            return []
+
+        stage = max(stages, key=lambda s: s.end)
+        path = [stage]
+        while stage.requires:
+            stage = max((self.stages[r] for r in stage.requires), key=lambda s: s.end or 0)
+            path.insert(0, stage)
+
+        return path
+
+    @property
+    def elapsed(self):
+        """
+        Seconds spent running the pipeline
+        @rtype: float
+        """
+        if self.start is None or self.end is None:
+            return 0.0
+
+        return self.end - self.start
+
+
+class PipelineError(Exception):
+    pass
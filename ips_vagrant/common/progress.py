@@ -2,19 +2,43 @@
 import os
 import sys
 import termios
+import threading
 import click
 import progressbar
 from array import array
+from contextlib import contextmanager
 from fcntl import ioctl
 
 _DEFAULT_MAXTERMSIZE = 80
+_local = threading.local()
+
+
+@contextmanager
+def quiet():
+    """
+    Suppress progress output from the current thread (e.g. for tasks running on a worker pool)
+    """
+    previous = is_quiet()
+    _local.quiet = True
+    try:
+        yield
+    finally:
+        _local.quiet = previous
+
+
+def is_quiet():
+    """
+    Check whether progress output is suppressed in the current thread
+    @rtype: bool
+    """
+    return getattr(_local, 'quiet', False)
 
 
 class ProgressBar(progressbar.ProgressBar):
     """
     ProgressBar decorator implementing custom widgets and max term width support
     """
-    def __init__(self, maxval=None, label=None, max_term_width=None, fd=sys.stderr):
+    def __init__(self, maxval=None, label=None, max_term_width=None, fd=None):
         """
         @param  maxval:         The maximum progress bar value
         @type   maxval:         str or None
@@ -22,13 +46,14 @@ class ProgressBar(progressbar.ProgressBar):
         @type   label:          str or None
         @param  max_term_width: Maximum terminal width allowed, or None for no restriction
         @type   max_term_width: int or None
-        @param  fd:             Output stream
+        @param  fd:             Output stream (Default: stderr)
         """
         self.max_term_width = max_term_width
         self.label = label
         self.max_term_width = max_term_width or _DEFAULT_MAXTERMSIZE
+        self.quiet = is_quiet()
         widgets = [Label(self.label), progressbar.Bar('#', '[', ']'), ' [', Percentage(), ']']
-        super(ProgressBar, self).__init__(maxval, widgets, fd=fd)
+        super(ProgressBar, self).__init__(maxval, widgets, fd=open(os.devnull, 'w') if self.quiet else fd or sys.stderr)
 
     def _format_line(self):
         """
@@ -48,7 +73,8 @@ class ProgressBar(progressbar.ProgressBar):
         """
         Hide cursor at start
         """
-        os.system('setterm -cursor off')
+        if not self.quiet:
+            os.system('setterm -cursor off')
         super(ProgressBar, self).start()
 
     def update(self, value=None, label=None):
@@ -66,7 +92,8 @@ class ProgressBar(progressbar.ProgressBar):
         """
         Re-enable cursor on finish
         """
-        os.system('setterm -cursor on')
+        if not self.quiet:
+            os.system('setterm -cursor on')
         super(ProgressBar, self).finish()
 
 
@@ -150,13 +177,14 @@ class MarkerProgressBar(ProgressBar):
         super(MarkerProgressBar, self).__init__(None, label, None)
         self.nl = nl
         # self.widgets = [Label(self.label, None), progressbar.AnimatedMarker(markers='.oO@* ')]
-        self.widgets = [Label(self.label, None), progressbar.AnimatedMarker(markers='←↖↑↗→↘↓↙'.decode('utf8'))]
+        self.widgets = [Label(self.label, None), progressbar.AnimatedMarker(markers='←↖↑↗→↘↓↙')]
 
     def finish(self):
         """
         Update widgets on finish
         """
-        os.system('setterm -cursor on')
+        if not self.quiet:
+            os.system('setterm -cursor on')
         if self.nl:
             Echo(self.label).done()
 
@@ -181,17 +209,21 @@ class Echo:
         self.message = self.message[:self.max_term_width - 7]
         self.color = color
         self.bold = bold
+        self.quiet = is_quiet()
 
-        click.secho(self.message, nl=False, fg=color, bold=bold)
+        if not self.quiet:
+            click.secho(self.message, nl=False, fg=color, bold=bold)
 
     def done(self, status=OK):
         """
         @type   status: str
         """
+        if self.quiet:
+            return
+
         padding = ' ' * ((self.max_term_width - 6) - len(self.message))
         suffix = click.style(']', fg=self.color, bold=self.bold)
         message = '{msg}{pad}[{status}{suf}'.format(msg=self.message, pad=padding, status=status, suf=suffix)
-        stdout = click.get_text_stream('stdout')
-        stdout.write('\r\033[K')
-        stdout.flush()
+        sys.stdout.write('\r\033[K')
+        sys.stdout.flush()
         click.secho(message, fg=self.color, bold=self.bold)
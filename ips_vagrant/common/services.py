@@ -0,0 +1,135 @@
+import shlex
+import logging
+import threading
+import subprocess
+from ips_vagrant.common import config as load_config
+
+
+class ServiceReloader(object):
+    """
+    Validates a service's configuration and reloads it gracefully, configured from the [Services] section of
+    ipsv.conf. Requests made while a reload is running are coalesced into a single follow-up reload, so concurrent
+    stages and provisioning workers don't reload the service once each. Services that may not be running yet, such as
+    those just installed by setup, are restarted instead.
+    """
+    # Service names and their [Services] setting prefixes
+    SERVICES = {'nginx': 'Nginx', 'php-fpm': 'PhpFpm'}
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, name, test_command, reload_command, restart_command):
+        """
+        @param  name:               Service name
+        @type   name:               str
+        @param  test_command:       Command validating the service configuration, or None to skip validation
+        @type   test_command:       str or None
+        @param  reload_command:     Command gracefully reloading the service
+        @type   reload_command:     str
+        @param  restart_command:    Command restarting the service, starting it if it isn't running
+        @type   restart_command:    str
+        """
+        self.name = name
+        self.test_command = test_command
+        self.reload_command = reload_command
+        self.restart_command = restart_command
+        self.log = logging.getLogger('ipsv.common.services')
+
+        self._reload_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._requested = 0
+        self._completed = 0
+
+    @classmethod
+    def get(cls, service, config=None):
+        """
+        Get the shared reloader of a service
+        @param  service:    nginx or php-fpm
+        @type   service:    str
+        @param  config:     Configuration to read the [Services] settings from (Default: the system configuration)
+        @type   config:     configparser.ConfigParser or None
+        @rtype: ServiceReloader
+        """
+        config = config or load_config()
+        prefix = cls.SERVICES[service]
+        settings = (service, config.get('Services', prefix + 'Test') or None, config.get('Services', prefix + 'Reload'),
+                    config.get('Services', prefix + 'Restart'))
+        with cls._instances_lock:
+            if settings not in cls._instances:
+                cls._instances[settings] = cls(*settings)
+            return cls._instances[settings]
+
+    def reload(self):
+        """
+        Validate the configuration and reload the service, once every change made before this request is covered by a
+        reload
+        @return:    False if a reload made for a later request already covered this one
+        @rtype:     bool
+        @raise  ServiceError:   The configuration test or the reload failed
+        """
+        with self._state_lock:
+            self._requested += 1
+            ticket = self._requested
+
+        with self._reload_lock:
+            # A reload started while we waited covers this request too
+            with self._state_lock:
+                if self._completed >= ticket:
+                    self.log.debug('%s reload request coalesced', self.name)
+                    return False
+                target = self._requested
+
+            if self.test_command:
+                self._call(self.test_command, 'configuration test')
+            self._call(self.reload_command, 'reload')
+
+            with self._state_lock:
+                self._completed = target
+
+        return True
+
+    def restart(self):
+        """
+        Validate the configuration and restart the service, starting it if it isn't running. This drops in-flight
+        requests, so it's only meant for services that may not be running yet.
+        @raise  ServiceError:   The configuration test or the restart failed
+        """
+        with self._state_lock:
+            self._requested += 1
+            target = self._requested
+
+        with self._reload_lock:
+            if self.test_command:
+                self._call(self.test_command, 'configuration test')
+            self._call(self.restart_command, 'restart')
+
+            # A restart loads the configuration just like a reload
+            with self._state_lock:
+                self._completed = max(self._completed, target)
+
+    def _call(self, command, action):
+        """
+        Run a service command
+        @type   command:    str
+        @param  action:     Description of the command, for logging and errors
+        @type   action:     str
+        @raise  ServiceError:   The command exited with a non-zero status
+        """
+        self.log.debug('Running %s %s: %s', self.name, action, command)
+        try:
+            process = subprocess.run(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     universal_newlines=True)
+        except OSError as e:
+            raise ServiceError('Unable to run the {s} {a} ({e})'.format(s=self.name, a=action, e=str(e)))
+
+        output = process.stdout.strip()
+        if process.returncode:
+            self.log.error('%s %s failed:\n%s', self.name, action, output)
+            raise ServiceError('The {s} {a} failed{o}'.format(
+                s=self.name, a=action, o=': ' + output.splitlines()[-1] if output else ''))
+        if output:
+            self.log.debug('%s %s output:\n%s', self.name, action, output)
+
+
+class ServiceError(Exception):
+    pass
@@ -47,8 +47,8 @@ class CertificateFactory:
         cert.sign(key, digest)
 
         # Dump the PEM data and return a certificate container
-        _cert = crypto.dump_certificate(crypto.FILETYPE_PEM, cert)
-        _key  = crypto.dump_privatekey(crypto.FILETYPE_PEM, key)
+        _cert = crypto.dump_certificate(crypto.FILETYPE_PEM, cert).decode('ascii')
+        _key  = crypto.dump_privatekey(crypto.FILETYPE_PEM, key).decode('ascii')
 
         return Certificate(_cert, _key, type, bits, digest)
 
@@ -0,0 +1,108 @@
+import os
+import sys
+
+# Global options taking a value, which may come before the command name
+VALUE_OPTIONS = ('-c', '--config')
+
+
+def forward(args):
+    """
+    Run a command in the ipsv daemon, if it's running and the command can be run there
+    @param  args:   Command line arguments
+    @type   args:   list of str
+    @return:    The command's exit code, or None if the command should be run locally instead
+    @rtype:     int or None
+    """
+    if os.environ.get('IPSV_NO_DAEMON'):
+        return None
+
+    command = _command_name(args)
+    if command is None:
+        return None
+
+    cfg = daemon_config()
+    if not cfg.has_section('Daemon') or command not in cfg.get('Daemon', 'Commands').split():
+        return None
+
+    path = cfg.get('Daemon', 'Socket')
+    if not os.path.exists(path):
+        return None
+
+    import shutil
+
+    request = {
+        'args': args,
+        'cwd': os.getcwd(),
+        'env': {k: v for k, v in os.environ.items() if k.startswith('IPSV_')},
+        'color': sys.stdout.isatty(),
+        'width': shutil.get_terminal_size().columns
+    }
+
+    try:
+        response = call(path, request, cfg.getfloat('Daemon', 'Timeout'))
+    except (OSError, ValueError):
+        # The daemon isn't running (a stale socket) or went away, so run the command ourselves
+        return None
+
+    if response.get('status') != 'done':
+        return None
+
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stdout.flush()
+    sys.stderr.write(response.get('stderr', ''))
+    sys.stderr.flush()
+    return response.get('exit', 1)
+
+
+def daemon_config():
+    """
+    Load the system configuration, along with the user configuration file ipsv would load
+    @rtype: configparser.ConfigParser
+    """
+    from ips_vagrant.common import config
+    cfg = config()
+    cfg.read(os.environ.get('IPSV_CONFIG_PATH', '/etc/ipsv/ipsv.conf'))
+    return cfg
+
+
+def call(path, request, timeout=None):
+    """
+    Send a request to the ipsv daemon and wait for its response
+    @param  path:       Daemon socket path
+    @type   path:       str
+    @param  request:    JSON serializable request
+    @type   request:    dict
+    @param  timeout:    Seconds to wait for the response, or None to wait forever
+    @type   timeout:    float or None
+    @rtype: dict
+    """
+    import json
+    import socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(timeout or None)
+        client.connect(path)
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('rb') as stream:
+            return json.loads(stream.readline().decode('utf-8'))
+    finally:
+        client.close()
+
+
+def _command_name(args):
+    """
+    Find the name of the command being run
+    @type   args:   list of str
+    @return:    The command name, or None if no command is run (e.g. --help or --version)
+    @rtype:     str or None
+    """
+    args = iter(args)
+    for arg in args:
+        if arg in VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+        elif arg in ('--help', '--version'):
+            return None
+
+    return None
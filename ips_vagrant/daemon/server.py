@@ -0,0 +1,248 @@
+import io
+import os
+import sys
+import json
+import click
+import signal
+import logging
+import traceback
+import socketserver
+from contextlib import contextmanager
+from ips_vagrant import __version__
+from ips_vagrant.daemon import call, daemon_config
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    ipsv daemon, running forwarded commands one at a time. Each command gets a fresh CLI context, so configuration
+    files loaded with -c don't leak into the commands that follow, but the modules it imports, the registry engine,
+    shared connection pools and compiled templates stay loaded, and the login session is carried over.
+    """
+    def __init__(self, path):
+        """
+        @param  path:   Socket path
+        @type   path:   str
+        """
+        self.log = logging.getLogger('ipsv.daemon')
+        self.path = path
+        # The login session, its cookie jar and when it was last checked. It's saved in the data directory of the
+        # system configuration, so it doesn't depend on the configuration a command loads.
+        self.login = (None, None, 0)
+
+        if os.path.exists(path):
+            # Refuse to replace the socket of a daemon that's still running
+            try:
+                call(path, {'args': None}, 1)
+            except (OSError, ValueError):
+                os.unlink(path)
+            else:
+                raise DaemonError('The ipsv daemon is already running: {p}'.format(p=path))
+
+        socketserver.UnixStreamServer.__init__(self, path, DaemonHandler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        """
+        Close the server and remove its socket
+        """
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def run(self, request):
+        """
+        Run a forwarded command
+        @param  request:    Command arguments, the client's working directory, IPSV_* environment variables and
+                            terminal settings
+        @type   request:    dict
+        @return:    The command's exit code and output, or a fallback status if the client should run it instead
+        @rtype:     dict
+        """
+        from ips_vagrant.cli import cli, Context
+
+        if not isinstance(request.get('args'), list):
+            return {'status': 'fallback'}
+
+        context = Context()
+        context._login, context.cookiejar, context._login_checked = self.login
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        try:
+            with _directory(request.get('cwd')), _environment(request.get('env') or {}), _streams(stdout, stderr):
+                exit_code = self._main(cli, context, request, stderr)
+        except OSError:
+            # We can't run the command from the client's working directory
+            return {'status': 'fallback'}
+        except Interactive:
+            # Prompts need the client's terminal
+            return {'status': 'fallback'}
+        finally:
+            self.login = context._login, context.cookiejar, context._login_checked
+            context.close()
+
+        return {'status': 'done', 'exit': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+    def _main(self, cli, context, request, stderr):
+        """
+        Run the CLI with a forwarded command's arguments
+        @type   cli:        ips_vagrant.cli.IpsvCLI
+        @type   context:    ips_vagrant.cli.Context
+        @type   request:    dict
+        @param  stderr:     Captured error output, errors are reported to
+        @type   stderr:     io.StringIO
+        @return:    The command's exit code
+        @rtype:     int
+        @raise  Interactive:    The command prompted for input
+        """
+        try:
+            cli.main(request['args'], prog_name='ipsv', standalone_mode=False, obj=context, forward=False,
+                     color=request.get('color'), terminal_width=request.get('width'))
+        except click.ClickException as e:
+            e.show(file=stderr)
+            return e.exit_code
+        except click.Abort:
+            stderr.write('Aborted!\n')
+            return 1
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 1
+        except Interactive:
+            raise
+        except Exception:
+            self.log.exception('Forwarded command failed: %s', ' '.join(request['args']))
+            stderr.write(traceback.format_exc())
+            return 1
+
+        return 0
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """
+    Reads one JSON request line and writes back one JSON response line
+    """
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError:
+            return
+
+        response = self.server.run(request) if isinstance(request, dict) else {'status': 'fallback'}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+@contextmanager
+def _directory(path):
+    """
+    Run a command from the client's working directory
+    @param  path:   Working directory, or None to stay in the daemon's
+    @type   path:   str or None
+    """
+    if not path:
+        yield
+        return
+
+    saved = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(saved)
+
+
+@contextmanager
+def _environment(env):
+    """
+    Apply the client's IPSV_* environment variables for the duration of a command
+    @type   env:    dict
+    """
+    saved = {k: v for k, v in os.environ.items() if k.startswith('IPSV_')}
+    for key in saved:
+        del os.environ[key]
+    os.environ.update({k: v for k, v in env.items() if k.startswith('IPSV_')})
+    try:
+        yield
+    finally:
+        for key in [k for k in os.environ if k.startswith('IPSV_')]:
+            del os.environ[key]
+        os.environ.update(saved)
+
+
+@contextmanager
+def _streams(stdout, stderr):
+    """
+    Capture a command's output, including console log messages, and turn prompts into a fallback to the client
+    @type   stdout: io.StringIO
+    @type   stderr: io.StringIO
+    """
+    saved_streams = {h: h.stream for h in _console_handlers()}
+    saved_prompts = (click.termui.visible_prompt_func, click.termui.hidden_prompt_func)
+    saved_stdout, saved_stderr = sys.stdout, sys.stderr
+
+    sys.stdout, sys.stderr = stdout, stderr
+    click.termui.visible_prompt_func = click.termui.hidden_prompt_func = _prompt
+    for handler in saved_streams:
+        handler.setStream(stderr)
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = saved_stdout, saved_stderr
+        click.termui.visible_prompt_func, click.termui.hidden_prompt_func = saved_prompts
+        # The first command adds the console logger, writing to the captured stream it was created with
+        for handler in _console_handlers():
+            handler.setStream(saved_streams.get(handler, saved_stderr))
+
+
+def _console_handlers():
+    """
+    Get the ipsv logger's console handlers
+    @rtype: list of logging.StreamHandler
+    """
+    return [h for h in logging.getLogger('ipsv').handlers
+            if isinstance(h, logging.StreamHandler) and not isinstance(h, logging.FileHandler)]
+
+
+def _prompt(text=''):
+    raise Interactive(text)
+
+
+@click.command(context_settings=dict(max_content_width=100))
+@click.option('-s', '--socket', 'path', type=click.Path(dir_okay=False, resolve_path=True),
+              help='Path to the daemon socket. (Default: [Daemon] Socket)')
+@click.option('-v', '--verbose', count=True, help='-v|vv Log information or debug messages from the daemon')
+@click.version_option(__version__)
+def cli(path, verbose):
+    """
+    Run the ipsv daemon. While it's running, ipsv forwards the commands listed in [Daemon] Commands to it, so they
+    run without reloading ipsv, its login session and site registry every time.
+    """
+    log = logging.getLogger('ipsv.daemon')
+    log.setLevel({0: logging.WARN, 1: logging.INFO}.get(verbose, logging.DEBUG))
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(asctime)s] [%(levelname)s] %(name)s: %(message)s"))
+    log.addHandler(handler)
+    log.propagate = False
+
+    path = path or daemon_config().get('Daemon', 'Socket')
+    try:
+        server = DaemonServer(path)
+    except (DaemonError, OSError) as e:
+        raise click.ClickException(str(e))
+
+    # Stop cleanly when terminated, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    log.info('Listening on %s', path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log.info('Stopped')
+
+
+class DaemonError(Exception):
+    pass
+
+
+class Interactive(Exception):
+    pass
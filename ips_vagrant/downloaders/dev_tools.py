@@ -9,12 +9,14 @@ from ips_vagrant.downloaders import IpsManager
 from ips_vagrant.scrapers.errors import HtmlParserError
 from ips_vagrant.common.version import Version
 from ips_vagrant.downloaders.downloader import DownloadManager, DownloadMeta
+from ips_vagrant.downloaders.index import VersionIdMap
 
 
 class DevToolsManager(DownloadManager):
     """
     IPS Developer Tools Manager
     """
+    SETUP_DIR = r'^(\d+)|(dev_[0-9a-zA-Z]{5})/?$'
     FILE_URL = 'https://community.invisionpower.com/files/file/7185-developer-tools/'
     DOWNLOAD_URL = 'https://community.invisionpower.com/files/file/7185-developer-tools/?do=download'
 
@@ -37,7 +39,15 @@ class DevToolsManager(DownloadManager):
         Populate IPS version data for mapping
         @return:
         """
-        # Get a map of version ID's from our most recent IPS version
+        # IpsManager maintains a map of every version ID it has seen, so we only need to read that
+        version_ids = VersionIdMap(os.path.join(os.path.dirname(self.path), 'ips', VersionIdMap.FILENAME))
+        if version_ids.ids:
+            self.ips_versions = version_ids.ids
+            self.log.debug("%d version ID's loaded from the version ID map", len(self.ips_versions))
+            return
+
+        # Otherwise, get a map of version ID's from our most recent IPS version
+        self.log.info('No version ID map available yet, reading the latest IPS release instead')
         ips = IpsManager(self.ctx)
         ips = ips.dev_version or ips.latest
         with ZipFile(ips.filepath) as zip:
@@ -47,6 +57,7 @@ class DevToolsManager(DownloadManager):
             if ips_versions_path not in namelist:
                 raise BadZipfile('Missing versions.json file')
             self.ips_versions = json.loads(zip.read(ips_versions_path), object_pairs_hook=OrderedDict)
+            version_ids.merge(self.ips_versions)
             self.log.debug("%d version ID's loaded from latest IPS release", len(self.ips_versions))
 
     def _populate_latest(self):
@@ -57,8 +68,7 @@ class DevToolsManager(DownloadManager):
             self.log.debug('No site specified, not retrieving latest version information')
             return
 
-        response = self.session.get(self.FILE_URL)
-        self.log.debug('Response code: %s', response.status_code)
+        response = self.http_cache.get(self.FILE_URL)
         if response.status_code != 200:
             raise HtmlParserError
 
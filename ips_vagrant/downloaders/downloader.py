@@ -2,10 +2,18 @@ from collections import OrderedDict
 from glob import glob
 import os
 import logging
+import threading
 from zipfile import BadZipfile
 from abc import abstractmethod, ABCMeta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hashlib import sha256
+import requests
 from mechanize import Browser
 from ips_vagrant.common import http_session, unparse_version
+from ips_vagrant.common.cache import HttpCache
+from ips_vagrant.downloaders.index import ArchiveIndex
+from ips_vagrant.downloaders.releases import ReleaseTree
+from ips_vagrant.downloaders.store import ObjectStore
 from ips_vagrant.scrapers.errors import HtmlParserError
 
 
@@ -13,6 +21,8 @@ class DownloadManager(object, metaclass=ABCMeta):
     """
     IPS Versions Manager
     """
+    # Regular expression the top level setup directory of an archive must match
+    SETUP_DIR = None
 
     # noinspection PyShadowingBuiltins
     def __init__(self, ctx, meta_class):
@@ -23,6 +33,11 @@ class DownloadManager(object, metaclass=ABCMeta):
         self.ctx = ctx
         self.log = logging.getLogger('ipsv.downloader')
         self.session = http_session(ctx.cookiejar)
+        identity = None
+        if ctx.cookiejar is not None:
+            identity = next((c.value for c in ctx.cookiejar if c.name == ctx.login.LOGIN_COOKIE), None)
+        self.http_cache = HttpCache(self.session, os.path.join(self.ctx.config.get('Paths', 'Data'), 'cache', 'http'),
+                                    self.ctx.config.getint('Cache', 'TTL'), self.ctx.refresh, identity)
         self.meta_class = meta_class
         self.meta_name = self.meta_class.__name__
 
@@ -30,11 +45,15 @@ class DownloadManager(object, metaclass=ABCMeta):
         self.dev_path = None
         self.dev_version = None
         self.versions = OrderedDict()
+        self.index = None
+        self.store = None
 
     def _setup(self):
         """
         Run setup tasks after initialization
         """
+        self.index = ArchiveIndex(os.path.join(self.path, 'index.json'))
+        self.store = ObjectStore(os.path.join(self.path, 'objects'))
         self._populate_local()
         try:
             self._populate_latest()
@@ -55,26 +74,97 @@ class DownloadManager(object, metaclass=ABCMeta):
         archives = glob(os.path.join(self.path, '*.zip'))
         for archive in archives:
             try:
-                version = self._read_zip(archive)
+                version = self._read_archive(archive)
                 self.versions[version.vtuple] = self.meta_class(self, version, filepath=archive)
             except BadZipfile as e:
-                self.log.warn('Unreadable zip archive in versions directory (%s): %s', e.message, archive)
+                self.log.warn('Unreadable zip archive in versions directory (%s): %s', str(e), archive)
 
         if self.dev_path:
             dev_archives = glob(os.path.join(self.dev_path, '*.zip'))
             dev_versions = []
             for dev_archive in dev_archives:
                 try:
-                    dev_versions.append((self._read_zip(dev_archive), dev_archive))
+                    dev_versions.append((self._read_archive(dev_archive), dev_archive))
                 except BadZipfile as e:
-                    self.log.warn('Unreadable zip archive in versions directory (%s): %s', e.message, dev_archive)
+                    self.log.warn('Unreadable zip archive in versions directory (%s): %s', str(e), dev_archive)
 
-            if not dev_versions:
+            archives += dev_archives
+            if dev_versions:
+                dev_version = sorted(dev_versions, key=lambda v: v[0].vtuple).pop()
+                self.dev_version = self.meta_class(self, dev_version[0], filepath=dev_version[1])
+            else:
                 self.log.debug('No development releases found')
-                return
 
-            dev_version = sorted(dev_versions, key=lambda v: v[0].vtuple).pop()
-            self.dev_version = self.meta_class(self, dev_version[0], filepath=dev_version[1])
+        self.index.prune(archives)
+        self.index.save()
+
+    def _archives(self):
+        """
+        Get the paths of all local archives
+        @rtype: list of str
+        """
+        archives = glob(os.path.join(self.path, '*.zip'))
+        if self.dev_path:
+            archives += glob(os.path.join(self.dev_path, '*.zip'))
+
+        return archives
+
+    def _read_archive(self, filepath):
+        """
+        Get the version of a local archive, only reading the archive itself if it is not already indexed
+        @type   filepath:   str
+        @rtype: ips_vagrant.common.version.Version
+        """
+        if not os.path.exists(filepath):
+            raise BadZipfile('Archive reference points to a missing object')
+
+        version = self.index.get(filepath)
+        if version is None:
+            version = self._read_zip(filepath)
+            # Archives downloaded before the object store existed are moved into it the first time they're indexed
+            with self.store.lock():
+                digest = self.store.digest(filepath) or self.store.adopt(filepath)
+            self.index.update(filepath, version, digest)
+
+        return version
+
+    def reindex(self):
+        """
+        Discard the archive index and rebuild it from the local archives, moving any plain archives into the object
+        store and removing stored objects that are no longer referenced
+        """
+        # Archives indexed before the object store existed are never index misses, so they're adopted here
+        with self.store.lock():
+            for archive in self._archives():
+                if not os.path.islink(archive):
+                    self.store.adopt(archive)
+
+        self.index.clear()
+        self.versions = OrderedDict((k, v) for k, v in self.versions.items() if not v.filepath)
+        if self.dev_version and self.dev_version.filepath:
+            self.dev_version = None
+
+        self._populate_local()
+        self._sort()
+        with self.store.lock():
+            self.store.collect(self._archives())
+
+    def verify(self, workers=None):
+        """
+        Verify all local archives against their content digests
+        @param  workers:    Number of worker processes (Default: one per CPU core)
+        @type   workers:    int or None
+        @return:    Archive paths mapped to True (verified), False (corrupt or missing) or None (not content-addressed)
+        @rtype:     dict
+        """
+        refs = {archive: self.store.digest(archive) for archive in self._archives()}
+        object_paths = set(self.store.object_path(digest) for digest in refs.values() if digest)
+        results = self.store.verify([op for op in object_paths if os.path.isfile(op)], workers)
+
+        return {
+            archive: results.get(self.store.object_path(digest), False) if digest else None
+            for archive, digest in refs.items()
+        }
 
     @abstractmethod
     def _populate_latest(self):
@@ -113,6 +203,18 @@ class DownloadManager(object, metaclass=ABCMeta):
         version.download()
         return version.filepath
 
+    def release_tree(self, version):
+        """
+        Get the pristine extracted release tree for a downloaded version
+        @type   version:    DownloadMeta
+        @rtype: ReleaseTree
+        """
+        # Trees are keyed by content, so re-downloading a version with different contents gets a fresh tree
+        key = self.store.digest(version.filepath) or version.version.vstring.replace(' ', '-')
+        path = os.path.join(self.ctx.config.get('Paths', 'Data'), 'releases', os.path.basename(self.path), key)
+        return ReleaseTree(path, version.filepath, self.SETUP_DIR, self.ctx.config.get('Releases', 'Link'),
+                           self.ctx.config.getint('Extract', 'Workers'))
+
     @property
     def latest(self):
         return self.versions[next(reversed(self.versions))]
@@ -122,6 +224,13 @@ class DownloadMeta(object):
     """
     Version metadata container
     """
+    # Response chunk size and file write buffer size, in bytes
+    CHUNK_SIZE = 65536
+    BUFFER_SIZE = 1048576
+
+    # Smallest byte range worth fetching in its own segment
+    MIN_SEGMENT_SIZE = 4194304
+
     def __init__(self, manager, version, filepath=None, request=None, dev=False):
         """
         @type   manaer:     DownloadManager
@@ -141,6 +250,9 @@ class DownloadMeta(object):
 
         self.session = self.manager.session
         self._browser = Browser()
+        self._ranges = True
+        # Size of the partial download and the running digest of its content, kept between attempts
+        self._partial = None
 
     def download(self):
         """
@@ -148,30 +260,297 @@ class DownloadMeta(object):
         @return:    Download file path
         @rtype:     str
         """
-        # Submit a download request and test the response
-        self.log.debug('Submitting request: %s', self.request)
-        response = self.session.request(*self.request, stream=True)
-        if response.status_code != 200:
-            self.log.error('Download request failed: %d', response.status_code)
-            raise HtmlParserError
-
-        # If we're re-downloading this version, delete the old file
-        if self.filepath and os.path.isfile(self.filepath):
-            self.log.info('Removing old version download')
-            os.remove(self.filepath)
-
         # Make sure our versions data directory exists
         if not os.path.isdir(self.basedir):
             self.log.debug('Creating versions data directory')
             os.makedirs(self.basedir, 0o755)
 
-        # Process our file download
+        # Downloads are written to a partial file first, so a failed download never replaces a good one
         vslug = self.version.vstring.replace(' ', '-')
-        self.filepath = self.filepath or os.path.join(self.basedir, '{v}.zip'.format(v=vslug))
-        with open(self.filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:  # filter out keep-alive new chunks
-                    f.write(chunk)
-                    f.flush()
+        filepath = self.filepath or os.path.join(self.basedir, '{v}.zip'.format(v=vslug))
+        part_path = '{fp}.part'.format(fp=filepath)
+
+        retries = self.manager.ctx.config.getint('Downloads', 'Retries')
+        attempt = 0
+        while True:
+            try:
+                digest = self._fetch(part_path)
+                break
+            except (requests.RequestException, DownloadError) as e:
+                attempt += 1
+                if attempt > retries:
+                    self.log.error('Download failed after %d attempts, partial download saved to %s',
+                                   attempt, part_path)
+                    raise
+                self.log.warn('Download interrupted (%s), resuming (attempt %d of %d)', str(e), attempt, retries)
+
+        # Make sure we actually received a readable archive before moving it into place
+        try:
+            version = self.manager._read_zip(part_path)
+        except BadZipfile:
+            self.log.error('Downloaded archive failed verification, discarding it: %s', part_path)
+            os.remove(part_path)
+            raise
 
+        # Store the archive by its content digest and point the version reference at it
+        # Objects this replaces are left for an explicit reindex to collect
+        with self.manager.store.lock():
+            self.manager.store.add(part_path, digest)
+            self.manager.store.link(digest, filepath)
+        self.manager.index.update(filepath, version, digest)
+        self.manager.index.save()
+        self.filepath = filepath
         self.log.info('Version {v} successfully downloaded to {fn}'.format(v=self.version, fn=self.filepath))
+
+    def _fetch(self, part_path):
+        """
+        Download to a partial file, resuming from the end of any existing partial download
+        @param  part_path:  Partial download file path
+        @type   part_path:  str
+        @raise  DownloadError:  The download ended before the full response body was received
+        @return:    SHA-256 hex digest of the completed partial file
+        @rtype:     str
+        """
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        headers = {'Range': 'bytes={o}-'.format(o=offset)} if offset else {}
+
+        # Submit a download request and test the response
+        self.log.debug('Submitting request: %s (offset %d)', self.request, offset)
+        response = self.session.request(*self.request, stream=True, headers=headers)
+        if offset and response.status_code == 416:
+            self.log.info('Partial download is already complete')
+            return self._partial_digest(part_path, offset).hexdigest()
+
+        # The digest is calculated as the download streams in; only a partial file left by an earlier run is read back
+        if offset and response.status_code == 206:
+            self.log.info('Resuming download at byte %d', offset)
+            mode = 'ab'
+            digest = self._partial_digest(part_path, offset)
+        elif response.status_code == 200:
+            if offset:
+                self.log.info('Server does not support resuming downloads, restarting download')
+            offset = 0
+            mode = 'wb'
+            digest = sha256()
+        else:
+            self.log.error('Download request failed: %d', response.status_code)
+            raise HtmlParserError
+
+        # Fresh downloads may be split into concurrent byte range requests
+        segments = self._segments(response)
+        if mode == 'wb' and segments > 1:
+            response.close()
+            self._partial = None
+            return self._fetch_segments(part_path, response, segments)
+
+        # Process our file download
+        length = response.headers.get('Content-Length')
+        received = 0
+        try:
+            with open(part_path, mode, self.BUFFER_SIZE) as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if chunk:  # filter out keep-alive new chunks
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+        finally:
+            # An interrupted download is resumed from here, without reading back what we've already received
+            self._partial = offset + received, digest
+
+        if length is not None and received < int(length):
+            raise DownloadError('Received {r} of {l} bytes'.format(r=received, l=length))
+
+        return digest.hexdigest()
+
+    def _partial_digest(self, part_path, offset):
+        """
+        Get the running digest of the data already in a partial download. Attempts made by this process keep their
+        digest, so only a partial download left behind by an earlier run has to be read back.
+        @param  part_path:  Partial download file path
+        @type   part_path:  str
+        @param  offset:     Size of the partial download
+        @type   offset:     int
+        @rtype: _hashlib.HASH
+        """
+        if self._partial is not None and self._partial[0] == offset:
+            return self._partial[1].copy()
+
+        self.log.debug('Reading back %d bytes of a previous partial download', offset)
+        digest = sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.BUFFER_SIZE), b''):
+                digest.update(block)
+        return digest
+
+    def _segments(self, response):
+        """
+        Get the number of segments a response body should be downloaded in
+        @type   response:   requests.Response
+        @rtype: int
+        """
+        segments = self.manager.ctx.config.getint('Downloads', 'Segments')
+        length = response.headers.get('Content-Length')
+        if segments <= 1 or not self._ranges or not length:
+            return 1
+
+        if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+            self.log.debug('Server does not accept byte ranges, downloading in a single stream')
+            return 1
+
+        return max(1, min(segments, int(length) // self.MIN_SEGMENT_SIZE))
+
+    def _fetch_segments(self, part_path, response, segments):
+        """
+        Download a response body in concurrent byte ranges, written in place to a preallocated partial file
+        @param  part_path:  Partial download file path
+        @type   part_path:  str
+        @param  response:   The initial (unread) download response
+        @type   response:   requests.Response
+        @type   segments:   int
+        @return:    SHA-256 hex digest of the downloaded file
+        @rtype:     str
+        """
+        length = int(response.headers['Content-Length'])
+        # Re-submitting a redirected form post would just redirect us again, so request the final URL directly
+        request = ('get', response.url) if response.history else self.request
+        bounds = [(i * length // segments, (i + 1) * length // segments - 1) for i in range(segments)]
+        self.log.info('Downloading %d bytes in %d segments', length, segments)
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            try:
+                os.posix_fallocate(fd, 0, length)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, length)
+
+            digest = SegmentDigest(fd, bounds, self.BUFFER_SIZE)
+            with ThreadPoolExecutor(segments) as pool:
+                futures = [pool.submit(self._fetch_segment, fd, request, start, end, digest)
+                           for start, end in bounds]
+                for future in as_completed(futures):
+                    future.result()
+        except Exception:
+            # Segments are not tracked between attempts, so a partial segmented download can't be resumed
+            os.close(fd)
+            os.remove(part_path)
+            raise
+
+        os.close(fd)
+        return digest.hexdigest()
+
+    def _fetch_segment(self, fd, request, start, end, digest):
+        """
+        Download a single byte range, retrying from the last received byte if the transfer is interrupted
+        @param  fd:         Partial download file descriptor
+        @type   fd:         int
+        @type   request:    tuple (method, url, params)
+        @param  start:      First byte offset
+        @type   start:      int
+        @param  end:        Last byte offset (inclusive)
+        @type   end:        int
+        @param  digest:     Digest of the whole download, notified of every chunk written
+        @type   digest:     SegmentDigest
+        """
+        retries = self.manager.ctx.config.getint('Downloads', 'Retries')
+        position = start
+        attempt = 0
+        while True:
+            headers = {'Range': 'bytes={s}-{e}'.format(s=position, e=end)}
+            try:
+                response = self.session.request(*request, stream=True, headers=headers)
+                if response.status_code != 206:
+                    # Fall back to a single stream for any further attempts
+                    self._ranges = False
+                    raise RangeError('Byte range request failed: {c}'.format(c=response.status_code))
+
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if chunk:
+                        os.pwrite(fd, chunk, position)
+                        digest.update(position, chunk)
+                        position += len(chunk)
+
+                if position <= end:
+                    raise DownloadError('Segment ended at byte {p} of {e}'.format(p=position, e=end))
+                return
+            except (requests.RequestException, DownloadError) as e:
+                attempt += 1
+                if isinstance(e, RangeError) or attempt > retries:
+                    raise
+                self.log.warn('Segment download interrupted (%s), resuming at byte %d', str(e), position)
+
+
+class SegmentDigest(object):
+    """
+    SHA-256 digest of a download written out of order by concurrent byte range requests. Data is hashed as soon as
+    everything before it has arrived: chunks written at the digest's position are hashed straight from memory, and
+    data that arrived ahead of it is read back from the page cache once the gap before it has been filled. Segment 0
+    streams straight into the digest, and the digest is complete as soon as the last segment is.
+    """
+    def __init__(self, fd, bounds, block_size):
+        """
+        @param  fd:         Download file descriptor, opened for writing and reading
+        @type   fd:         int
+        @param  bounds:     First and last byte offsets of each segment, in order
+        @type   bounds:     list of tuple of (int, int)
+        @param  block_size: Read buffer size in bytes
+        @type   block_size: int
+        """
+        self.fd = fd
+        self.block_size = block_size
+        self.position = 0
+        self._digest = sha256()
+        self._bounds = bounds
+        self._segment = 0
+        # The end of the data written by each segment so far
+        self._written = [start for start, end in bounds]
+        self._lock = threading.Lock()
+
+    def update(self, offset, chunk):
+        """
+        Record a chunk written to the download
+        @param  offset: File offset the chunk was written at
+        @type   offset: int
+        @type   chunk:  bytes
+        """
+        with self._lock:
+            segment = self._segment
+            while offset > self._bounds[segment][1]:
+                segment += 1
+            self._written[segment] = offset + len(chunk)
+
+            if offset == self.position:
+                self._digest.update(chunk)
+                self.position += len(chunk)
+            self._catch_up()
+
+    def _catch_up(self):
+        """
+        Hash any data that arrived ahead of the digest's position and is no longer preceded by a gap
+        """
+        while self._segment < len(self._bounds):
+            end = self._written[self._segment]
+            while self.position < end:
+                block = os.pread(self.fd, min(self.block_size, end - self.position), self.position)
+                if not block:
+                    raise DownloadError('Unable to read back byte {p} of the download'.format(p=self.position))
+                self._digest.update(block)
+                self.position += len(block)
+
+            if self.position <= self._bounds[self._segment][1]:
+                return
+            self._segment += 1
+
+    def hexdigest(self):
+        """
+        @return:    Hex digest of the complete download
+        @rtype:     str
+        """
+        return self._digest.hexdigest()
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RangeError(DownloadError):
+    pass
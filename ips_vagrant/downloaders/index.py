@@ -0,0 +1,185 @@
+import os
+import json
+import logging
+from collections import OrderedDict
+from ips_vagrant.common import file_digest
+from ips_vagrant.common.version import Version
+
+
+class ArchiveIndex(object):
+    """
+    Persistent metadata index for locally cached version archives
+    """
+    def __init__(self, path):
+        """
+        @param  path:   Path to the JSON index file
+        @type   path:   str
+        """
+        self.path = path
+        self.log = logging.getLogger('ipsv.downloader.index')
+        self.entries = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """
+        Load the index from disk, discarding it if it is unreadable
+        """
+        self.entries = {}
+        self._dirty = False
+        if not os.path.isfile(self.path):
+            self.log.debug('No archive index found: %s', self.path)
+            return
+
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+            self.log.debug('%d archive index entries loaded from %s', len(self.entries), self.path)
+        except (IOError, ValueError) as e:
+            self.log.warn('Unreadable archive index, it will be rebuilt (%s): %s', str(e), self.path)
+            self._dirty = True
+
+    def save(self):
+        """
+        Write the index to disk if it has changed
+        """
+        if not self._dirty:
+            return
+
+        tmp_path = '{p}.tmp'.format(p=self.path)
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path), 0o755)
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            self.log.warn('Unable to save the archive index (%s): %s', str(e), self.path)
+            return
+
+        self.log.debug('Archive index saved: %s', self.path)
+        self._dirty = False
+
+    def clear(self):
+        """
+        Discard all index entries
+        """
+        self.log.info('Clearing the archive index')
+        self.entries = {}
+        self._dirty = True
+
+    @staticmethod
+    def signature(filepath):
+        """
+        Get the stat signature of an archive
+        @type   filepath:   str
+        @rtype: tuple of (int, int)
+        """
+        stat = os.stat(filepath)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, filepath):
+        """
+        Get the indexed version of an archive, if its stat signature has not changed since it was indexed
+        @type   filepath:   str
+        @rtype: Version or None
+        """
+        entry = self.entries.get(filepath)
+        if not entry:
+            return None
+
+        if (entry['size'], entry['mtime']) != self.signature(filepath):
+            self.log.debug('Archive has changed since it was indexed: %s', filepath)
+            return None
+
+        return Version(entry['vstring'], entry['vid'])
+
+    def update(self, filepath, version, digest=None):
+        """
+        Index an archive
+        @type   filepath:   str
+        @type   version:    Version
+        @param  digest:     SHA-256 hex digest of the archive (calculated if not provided)
+        @type   digest:     str or None
+        """
+        self.log.debug('Indexing archive: %s', filepath)
+        size, mtime = self.signature(filepath)
+        self.entries[filepath] = {
+            'size': size,
+            'mtime': mtime,
+            'vid': version.vid,
+            'vstring': version.vstring,
+            'sha256': digest or file_digest(filepath)
+        }
+        self._dirty = True
+
+    def prune(self, filepaths):
+        """
+        Remove index entries for archives that no longer exist
+        @param  filepaths:  Archives that are still present
+        @type   filepaths:  list of str
+        """
+        filepaths = set(filepaths)
+        for filepath in [fp for fp in self.entries if fp not in filepaths]:
+            self.log.debug('Removing stale archive index entry: %s', filepath)
+            del self.entries[filepath]
+            self._dirty = True
+
+
+class VersionIdMap(object):
+    """
+    Shared IPS version ID map, merged from the versions.json file of every IPS release we have read
+    """
+    FILENAME = 'version_ids.json'
+
+    def __init__(self, path):
+        """
+        @param  path:   Path to the JSON version ID map
+        @type   path:   str
+        """
+        self.path = path
+        self.log = logging.getLogger('ipsv.downloader.index')
+        self.ids = self.load()
+
+    def load(self):
+        """
+        Load the version ID map from disk
+        @return:    Version ID's mapped to version strings, in ascending order
+        @rtype:     OrderedDict
+        """
+        if not os.path.isfile(self.path):
+            self.log.debug('No version ID map found: %s', self.path)
+            return OrderedDict()
+
+        try:
+            with open(self.path) as f:
+                return json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, ValueError) as e:
+            self.log.warn('Unreadable version ID map, it will be rebuilt (%s): %s', str(e), self.path)
+            return OrderedDict()
+
+    def merge(self, versions):
+        """
+        Merge the contents of a versions.json file into the map, saving it if anything new was added
+        @param  versions:   Version ID's mapped to version strings
+        @type   versions:   dict
+        """
+        if all(self.ids.get(vid) == version for vid, version in versions.items()):
+            return
+
+        ids = dict(self.ids)
+        ids.update(versions)
+        self.ids = OrderedDict(sorted(ids.items(), key=lambda v: int(v[0])))
+
+        tmp_path = '{p}.tmp'.format(p=self.path)
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path), 0o755)
+            with open(tmp_path, 'w') as f:
+                json.dump(self.ids, f, indent=2)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            self.log.warn('Unable to save the version ID map (%s): %s', str(e), self.path)
+            return
+
+        self.log.debug("%d version ID's saved to %s", len(self.ids), self.path)
@@ -7,12 +7,15 @@ import re
 from bs4 import BeautifulSoup
 from ips_vagrant.common.version import Version
 from ips_vagrant.downloaders.downloader import DownloadManager, DownloadMeta
+from ips_vagrant.downloaders.index import VersionIdMap
 
 
 class IpsManager(DownloadManager):
     """
     IPS Versions Manager
     """
+    SETUP_DIR = r'^ips_\w{5}/?$'
+
     # noinspection PyShadowingBuiltins
     def __init__(self, ctx, license=None):
         """
@@ -25,6 +28,7 @@ class IpsManager(DownloadManager):
         self.path = os.path.join(self.path, 'ips')
         self.dev_path = os.path.join(self.path, 'dev')
         self.dev_version = None
+        self.version_ids = VersionIdMap(os.path.join(self.path, VersionIdMap.FILENAME))
         self._setup()
 
     def _populate_latest(self):
@@ -36,8 +40,7 @@ class IpsManager(DownloadManager):
             return
 
         # Submit a request to the client area
-        response = self.session.get(self.license.license_url)
-        self.log.debug('Response code: %s', response.status_code)
+        response = self.http_cache.get(self.license.license_url)
         response.raise_for_status()
 
         # Load our license page
@@ -76,7 +79,7 @@ class IpsManager(DownloadManager):
         """
         with ZipFile(filepath) as zip:
             namelist = zip.namelist()
-            if re.match(r'^ips_\w{5}/?$', namelist[0]):
+            if re.match(self.SETUP_DIR, namelist[0]):
                 self.log.debug('Setup directory matched: %s', namelist[0])
             else:
                 self.log.error('No setup directory matched')
@@ -86,6 +89,7 @@ class IpsManager(DownloadManager):
             if versions_path not in namelist:
                 raise BadZipfile('Missing versions.json file')
             versions = json.loads(zip.read(versions_path), object_pairs_hook=OrderedDict)
+            self.version_ids.merge(versions)
             vid = next(reversed(versions))
             version = versions[vid]
 
@@ -0,0 +1,79 @@
+import os
+import shutil
+import logging
+import tempfile
+from ips_vagrant.common.clone import TreeCloner
+from ips_vagrant.common.extract import ZipExtractor, resolve_workers, DEFAULT_DIR_MODE
+
+
+class ReleaseTree(object):
+    """
+    Pristine extracted release tree, built once per archive and cloned into new sites
+    """
+    def __init__(self, path, archive, pattern, link='reflink', workers=1):
+        """
+        @param  path:       Release tree directory
+        @type   path:       str
+        @param  archive:    Release archive the tree is extracted from
+        @type   archive:    str
+        @param  pattern:    Regular expression the archive's top level setup directory must match
+        @type   pattern:    str
+        @param  link:       How files are cloned into sites: reflink (falls back to copy), hardlink or copy
+        @type   link:       str
+        @param  workers:    Number of files extracted or cloned in parallel, or 0 for one per CPU core
+        @type   workers:    int
+        """
+        self.path = path
+        self.archive = archive
+        self.pattern = pattern
+        self.link = link
+        self.workers = resolve_workers(workers)
+        self.log = logging.getLogger('ipsv.downloader.releases')
+
+    @property
+    def exists(self):
+        """
+        Check whether the release tree has already been built
+        @rtype: bool
+        """
+        return os.path.isdir(self.path)
+
+    def build(self):
+        """
+        Extract the release archive into the release tree
+        """
+        if not os.path.isdir(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path), 0o755)
+
+        # Extract next to the final path and move it into place, so a partially built tree is never used
+        tmpdir = tempfile.mkdtemp('.tmp', os.path.basename(self.path), os.path.dirname(self.path))
+        try:
+            os.chmod(tmpdir, DEFAULT_DIR_MODE)
+            ZipExtractor(self.archive, self.pattern, self.workers).extract(tmpdir)
+
+            try:
+                os.rename(tmpdir, self.path)
+            except OSError:
+                if not self.exists:
+                    raise
+                self.log.info('Release tree was built by another process: %s', self.path)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def populate(self, dest, mode=None, progress=None, copy=None):
+        """
+        Clone the release tree into a site root
+        @param  dest:       Destination directory
+        @type   dest:       str
+        @param  mode:       Callable returning the permissions for a (relative path, is directory) pair, or None for
+                            the defaults. Not applied to hardlinked files.
+        @type   mode:       callable or None
+        @param  progress:   Progress bar to wrap file batch completion in
+        @type   progress:   ips_vagrant.common.progress.ProgressBar or None
+        @param  copy:       Callable returning True for relative file paths that must never be hardlinked
+        @type   copy:       callable or None
+        """
+        # The tree is extracted with the default permissions, so cloning it keeps them
+        cloner = TreeCloner(self.path, self.link, self.workers)
+        cloner.clone(dest, mode, progress, copy)
+        self.link = cloner.link
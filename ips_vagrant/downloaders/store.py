@@ -0,0 +1,155 @@
+import os
+import fcntl
+import logging
+from glob import glob
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from ips_vagrant.common import file_digest
+
+
+class ObjectStore(object):
+    """
+    Content-addressed archive store
+
+    Archives are stored under their SHA-256 digest, and version archives in the versions directory are symlinks
+    (references) to them. Downloading identical content twice only ever stores a single copy. Changes to the store
+    should be made while holding its lock, so objects are never collected between being added and linked.
+    """
+    def __init__(self, path):
+        """
+        @param  path:   Object store directory
+        @type   path:   str
+        """
+        self.path = path
+        self.log = logging.getLogger('ipsv.downloader.store')
+
+    def object_path(self, digest):
+        """
+        Get the storage path for an object
+        @param  digest: SHA-256 hex digest
+        @type   digest: str
+        @rtype: str
+        """
+        return os.path.join(self.path, digest[:2], '{d}.zip'.format(d=digest))
+
+    def objects(self):
+        """
+        Get the paths of all stored objects
+        @rtype: list of str
+        """
+        return glob(os.path.join(self.path, '*', '*.zip'))
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the store-wide lock, across both threads and processes
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o755, exist_ok=True)
+
+        # Every holder opens its own file description, so flock also excludes other threads in this process
+        with open(os.path.join(self.path, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, filepath, digest):
+        """
+        Move a file into the store, discarding it if the store already holds identical content
+        @param  filepath:   File to add
+        @type   filepath:   str
+        @param  digest:     SHA-256 hex digest of the file
+        @type   digest:     str
+        @return:    Object path
+        @rtype:     str
+        """
+        object_path = self.object_path(digest)
+        if os.path.isfile(object_path):
+            self.log.info('Archive already stored, discarding duplicate: %s', filepath)
+            os.remove(filepath)
+            return object_path
+
+        if not os.path.isdir(os.path.dirname(object_path)):
+            os.makedirs(os.path.dirname(object_path), 0o755)
+
+        self.log.debug('Storing archive %s as %s', filepath, object_path)
+        os.rename(filepath, object_path)
+        return object_path
+
+    def link(self, digest, ref_path):
+        """
+        Point a version reference at a stored object, replacing any existing reference or file
+        @param  digest:     SHA-256 hex digest
+        @type   digest:     str
+        @param  ref_path:   Reference path
+        @type   ref_path:   str
+        """
+        target = os.path.relpath(self.object_path(digest), os.path.dirname(ref_path))
+        tmp_path = '{p}.lnk'.format(p=ref_path)
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+
+        self.log.debug('Linking %s -> %s', ref_path, target)
+        os.symlink(target, tmp_path)
+        os.rename(tmp_path, ref_path)
+
+    def adopt(self, filepath):
+        """
+        Move an existing plain archive into the store and replace it with a reference
+        @type   filepath:   str
+        @return:    SHA-256 hex digest
+        @rtype:     str
+        """
+        self.log.info('Adding archive to the object store: %s', filepath)
+        digest = file_digest(filepath)
+        self.add(filepath, digest)
+        self.link(digest, filepath)
+        return digest
+
+    def digest(self, ref_path):
+        """
+        Get the digest a reference points to
+        @type   ref_path:   str
+        @return:    SHA-256 hex digest, or None if the path is not a reference into this store
+        @rtype:     str or None
+        """
+        if not os.path.islink(ref_path):
+            return None
+
+        target = os.path.realpath(ref_path)
+        if os.path.dirname(os.path.dirname(target)) != os.path.realpath(self.path):
+            return None
+
+        return os.path.splitext(os.path.basename(target))[0]
+
+    def collect(self, ref_paths):
+        """
+        Remove stored objects that are no longer referenced
+        @param  ref_paths:  All current references
+        @type   ref_paths:  list of str
+        """
+        digests = set(self.digest(ref_path) for ref_path in ref_paths)
+        for object_path in self.objects():
+            if os.path.splitext(os.path.basename(object_path))[0] not in digests:
+                self.log.info('Removing unreferenced archive: %s', object_path)
+                os.remove(object_path)
+
+    def verify(self, object_paths, workers=None):
+        """
+        Check stored objects against their digests in parallel
+        @type   object_paths:   list of str
+        @param  workers:        Number of worker processes (Default: one per CPU core)
+        @type   workers:        int or None
+        @return:    Object paths mapped to whether their content matches their digest
+        @rtype:     dict
+        """
+        object_paths = list(object_paths)
+        self.log.info('Verifying %d archives', len(object_paths))
+        with ProcessPoolExecutor(workers) as pool:
+            digests = pool.map(file_digest, object_paths)
+            return {
+                object_path: digest == os.path.splitext(os.path.basename(object_path))[0]
+                for object_path, digest in zip(object_paths, digests)
+            }
@@ -1,6 +1,9 @@
 from abc import ABCMeta, abstractproperty
 from jinja2 import Environment, PackageLoader
 
+# Shared between generators, so each template is only compiled once per process
+_env = None
+
 
 class GeneratorAbstract(object, metaclass=ABCMeta):
     """
@@ -8,7 +11,10 @@ class GeneratorAbstract(object, metaclass=ABCMeta):
     """
 
     def __init__(self, template_path):
-        self.env = Environment(loader=PackageLoader('ips_vagrant.generators', 'templates'))
+        global _env
+        if _env is None:
+            _env = Environment(loader=PackageLoader('ips_vagrant.generators', 'templates'))
+        self.env = _env
         self.tpl = self.env.get_template(template_path)
         self._template_path = template_path
         self._template = None
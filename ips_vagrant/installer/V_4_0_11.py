@@ -8,12 +8,12 @@ version = (4, 0, 11)
 
 class Installer(V_4_1_3_2):
 
-    def _check_if_complete(self, url, json_response):
+    def _completion_link(self, url, json_response):
         """
-        Check if a request has been completed and return the redirect URL if it has
+        Get the MultipleRedirect link that completes the installation, once the installer reports it's done
         @type   url:            str
         @type   json_response:  list or dict
-        @rtype: str or bool
+        @rtype: str or None
         """
         if '__done' in json_response and isinstance(json_response, list):
             mr_parts = list(urlparse(url))
@@ -21,8 +21,7 @@ class Installer(V_4_1_3_2):
             mr_query['mr'] = '"' + str(json_response[0]) + '"'
             mr_parts[4] = urlencode(mr_query, True)
             mr_link = urlunparse(mr_parts)
-            mr_j, mr_r = self._ajax(mr_link)
             self.log.debug('MultipleRedirect link: %s', mr_link)
-            return super(Installer, self)._check_if_complete(url, mr_j)
+            return mr_link
 
-        return False
+        return None
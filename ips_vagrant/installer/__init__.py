@@ -5,16 +5,31 @@ import os
 import pkgutil
 
 
-versions = OrderedDict()
-path = os.path.join(os.path.dirname(os.path.realpath(__file__)))
-_modnames = [name for __, name, ispkg in pkgutil.iter_modules([path]) if not ispkg]
-for modname in _modnames:
-    m = importlib.import_module('ips_vagrant.installer.{name}'.format(name=modname))
-    versions[getattr(m, 'version')] = getattr(m, 'Installer')
-versions = OrderedDict(sorted(list(versions.items()), key=lambda v: v[0]))
+_versions = None
 
 
-def installer(cv, ctx, site, force=False):
+def load_versions():
+    """
+    Load the versioned installers. They're only imported once an installer is needed, as importing the helper
+    packages in this package (e.g. report) runs this module too.
+    @return:    Installer classes by version tuple, None being the latest
+    @rtype:     collections.OrderedDict
+    """
+    global _versions
+    if _versions is None:
+        versions = OrderedDict()
+        path = os.path.join(os.path.dirname(os.path.realpath(__file__)))
+        modnames = [name for __, name, ispkg in pkgutil.iter_modules([path]) if not ispkg]
+        for modname in modnames:
+            m = importlib.import_module('ips_vagrant.installer.{name}'.format(name=modname))
+            versions[getattr(m, 'version')] = getattr(m, 'Installer')
+        # The "latest" installer (version None) sorts first
+        _versions = OrderedDict(sorted(list(versions.items()), key=lambda v: (v[0] is not None, v[0] or ())))
+
+    return _versions
+
+
+def installer(cv, ctx, site, force=False, backend='web'):
     """
     Installer factory
     @param  cv:     Current version (The version of IPS we are installing)
@@ -24,11 +39,19 @@ def installer(cv, ctx, site, force=False):
     @type   site:   ips_vagrant.models.sites.Site
     @param  force:  Overwrite existing files / databases
     @type   force:  bool
+    @param  backend:    web to drive the web installer, or cli to run the setup steps through the PHP CLI
+    @type   backend:    str
     @return:    Installer instance
-    @rtype:     ips_vagrant.installer.latest.Installer
+    @rtype:     ips_vagrant.installer.latest.Installer or ips_vagrant.installer.headless.CliInstaller
     """
     log = logging.getLogger('ipsv.installer')
+    if backend == 'cli':
+        from ips_vagrant.installer.headless import CliInstaller
+        log.info('Returning the CLI installer')
+        return CliInstaller(ctx, site, force)
+
     log.info('Loading installer for IPS %s', cv)
+    versions = load_versions()
     iv = None
     for v in versions:
         vstring = '.'.join(map(str, v)) if v else 'latest'
@@ -1,9 +1,6 @@
 import logging
 import os
-import shutil
-from tempfile import mkdtemp
-from zipfile import ZipFile
-import re
+from ips_vagrant.common.extract import ZipExtractor
 from ips_vagrant.common.progress import Echo
 from ips_vagrant.downloaders.dev_tools import DevToolsManager
 
@@ -50,38 +47,8 @@ class DevToolsInstaller(object):
 
         # Extract dev files
         p = Echo('Extracting Developer Tools...')
-        tmpdir = mkdtemp('ips')
-        dev_tools_zip = os.path.join(tmpdir, 'dev_tools.zip')
-        dev_tools_dir = os.path.join(tmpdir, 'dev_tools')
-        os.mkdir(dev_tools_dir)
-
-        shutil.copyfile(filename, dev_tools_zip)
-        with ZipFile(dev_tools_zip) as z:
-            namelist = z.namelist()
-            if re.match(r'^(\d+)|(dev_[0-9a-zA-Z]{5})/?$', namelist[0]):
-                self.log.debug('Developer Tools directory matched: %s', namelist[0])
-            else:
-                self.log.error('No developer tools directory matched, unable to continue')
-                raise Exception('Unrecognized dev tools file format, aborting')
-
-            z.extractall(dev_tools_dir)
-            self.log.debug('Developer Tools extracted to: %s', dev_tools_dir)
-            dev_tmpdir = os.path.join(dev_tools_dir, namelist[0])
-            path = dev_tmpdir
-            for dirname, dirnames, filenames in os.walk(dev_tmpdir):
-                for filepath in dirnames:
-                    site_path = os.path.join(self.site.root, dirname.replace(path, ''), filepath)
-                    if not os.path.exists(site_path):
-                        self.log.debug('Creating directory: %s', site_path)
-                        os.mkdir(site_path, 0o755)
-
-                for filepath in filenames:
-                    tmp_path = os.path.join(dirname, filepath)
-                    site_path = os.path.join(self.site.root, dirname.replace(path, ''), filepath)
-                    shutil.copy(tmp_path, site_path)
-
-            self.log.info('Developer Tools copied to: %s', self.site.root)
-        shutil.rmtree(tmpdir)
+        workers = self.ctx.config.getint('Extract', 'Workers')
+        ZipExtractor(filename, DevToolsManager.SETUP_DIR, workers).extract(self.site.root)
         p.done()
 
         p = Echo('Putting IPS into IN_DEV mode...')
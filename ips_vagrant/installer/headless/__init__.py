@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import click
+import queue
+import logging
+import tempfile
+import threading
+import subprocess
+from ips_vagrant.common.mysql import MysqlAdmin, quote_identifier
+from ips_vagrant.common.progress import ProgressBar, is_quiet
+from ips_vagrant.installer.dev_tools.latest import DevToolsInstaller
+from ips_vagrant.installer.latest import InstallationError
+from ips_vagrant.installer.report import InstallReport
+from ips_vagrant.installer.snapshot import admin_credentials
+
+
+class CliInstaller(object):
+    """
+    Headless installer, running the IPS setup steps directly through the PHP CLI instead of driving the web installer
+    through nginx and php-fpm. Stage and progress updates are streamed back from the PHP script as JSON lines.
+    """
+    SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'install.php')
+
+    def __init__(self, ctx, site, force=False, php=None, script=None):
+        """
+        @type   ctx:    ips_vagrant.cli.Context
+        @param  site:   The IPS Site we are installing
+        @type   site:   ips_vagrant.models.sites.Site
+        @param  force:  Drop any tables already in the site database, instead of refusing to install over them
+        @type   force:  bool
+        @param  php:    PHP CLI binary (Default: [Installer] PhpBinary)
+        @type   php:    str or None
+        @param  script: Installer script run with the PHP CLI (Default: the bundled install.php)
+        @type   script: str or None
+        """
+        self.log = logging.getLogger('ipsv.installer.headless')
+        self.ctx = ctx
+        self.site = site
+        self.force = force
+        self.php = php or ctx.config.get('Installer', 'PhpBinary')
+        self.script = script or self.SCRIPT
+        self.url = '{scheme}://{host}/'.format(scheme='https' if site.ssl else 'http', host=site.domain.name)
+        self.report = InstallReport(ctx, site)
+
+    def start(self):
+        """
+        Run the installation
+        """
+        if not self.site.db_name:
+            raise InstallationError('The CLI installer requires the site database to be created first')
+        self._clear_database()
+
+        user, password, email = admin_credentials(self.ctx)
+        job = {
+            'root': self.site.root,
+            'url': self.url,
+            'license': '{license}-TESTINSTALL'.format(license=self.site.license_key),
+            'db': {'host': self.site.db_host or 'localhost', 'port': self.ctx.config.getint('MySQL', 'Port'),
+                   'name': self.site.db_name, 'user': self.site.db_user, 'pass': self.site.db_pass},
+            'admin': {'name': user, 'pass': password, 'email': email}
+        }
+
+        pbar = ProgressBar(100, 'Running installation...')
+        pbar.start()
+        try:
+            self._run(job, pbar)
+            pbar.finish()
+        except Exception as e:
+            self.report.save('failed', str(e) or e.__class__.__name__)
+            raise
+        self.report.save()
+
+        # Install developer tools
+        if self.site.in_dev:
+            DevToolsInstaller(self.ctx, self.site).install()
+
+        self.log.info('Installation complete: %s', self.url)
+        if not is_quiet():
+            click.echo('------')
+            click.secho('IPS installed from the command line', fg='yellow', bold=True)
+            click.echo(click.style('Go to the suite: ', bold=True) + self.url + '\n')
+
+    def _clear_database(self):
+        """
+        Drop the tables of a previous installation from the site database, if we're forcing the installation
+        @raise  InstallationError:  The database contains tables and we're not forcing the installation
+        """
+        mysql = MysqlAdmin.get(self.ctx.config)
+        tables = mysql.tables(self.site.db_name)
+        if not tables:
+            return
+
+        if not self.force:
+            raise InstallationError('The site database already contains {n} tables, use --force to replace them'
+                                    .format(n=len(tables)))
+
+        self.log.info('Dropping %d existing tables from %s', len(tables), self.site.db_name)
+        db = quote_identifier(self.site.db_name)
+        mysql.execute_batch(['SET SESSION foreign_key_checks = 0'] +
+                            ['DROP TABLE {d}.{t}'.format(d=db, t=quote_identifier(table)) for table in tables] +
+                            ['SET SESSION foreign_key_checks = 1'])
+
+    def _run(self, job, pbar):
+        """
+        Run the installer script, relaying its progress until it finishes
+        @param  job:    Installation settings passed to the script
+        @type   job:    dict
+        @type   pbar:   ProgressBar
+        """
+        timeout = self.ctx.config.getfloat('Installer', 'RequestTimeout')
+        self.log.debug('Running the CLI installer: %s %s', self.php, self.script)
+
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen([self.php, self.script], cwd=self.site.root, stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, stderr=stderr)
+            process.stdin.write(json.dumps(job).encode('utf-8'))
+            process.stdin.close()
+
+            # Lines are read on a separate thread, so a stalled step can be timed out
+            lines = queue.Queue()
+            threading.Thread(target=self._read_lines, args=(process.stdout, lines), daemon=True).start()
+
+            stage = 'Starting installation'
+            done = False
+            error = None
+            last = time.time()
+            while True:
+                try:
+                    line = lines.get(timeout=timeout)
+                except queue.Empty:
+                    process.kill()
+                    process.wait()
+                    raise InstallationError('The CLI installer made no progress within {t:g} seconds'
+                                            .format(t=timeout))
+                if line is None:
+                    break
+
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    self.log.debug('CLI installer output: %s', line.decode('utf-8', 'replace').rstrip())
+                    continue
+
+                # Each step's time belongs to the stage announced before it
+                now = time.time()
+                self.report.record(stage, now - last, len(line), event.get('progress'))
+                last = now
+
+                if 'error' in event:
+                    error = event['error']
+                elif event.get('done'):
+                    done = True
+                elif 'stage' in event:
+                    stage = event['stage'] or stage
+                    pbar.update(min([round(float(event.get('progress') or 0)), 100]), stage)
+
+            returncode = process.wait()
+            if error or returncode or not done:
+                stderr.seek(0)
+                output = stderr.read().decode('utf-8', 'replace').strip()
+                if output:
+                    self.log.error('CLI installer errors:\n%s', output)
+                if error:
+                    message = error
+                elif returncode:
+                    message = 'The CLI installer exited with code {c}'.format(c=returncode)
+                else:
+                    message = 'The CLI installer exited before the installation finished'
+                raise InstallationError(message + (': ' + output.splitlines()[-1] if output else ''))
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        """
+        Queue each line of the installer's output, followed by None once the output is closed
+        @type   stream: io.BufferedReader
+        @type   lines:  queue.Queue
+        """
+        for line in iter(stream.readline, b''):
+            lines.put(line)
+        lines.put(None)
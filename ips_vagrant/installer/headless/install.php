@@ -0,0 +1,103 @@
+<?php
+/**
+ * Headless IPS installer, run by ipsv through the PHP CLI from the root of a site with freshly copied setup files.
+ *
+ * Reads the installation settings as a JSON object from STDIN and runs the same setup steps as the web installer's
+ * MultipleRedirect, in-process. Progress is streamed to STDOUT as one JSON object per line:
+ *
+ *     {"stage": "Installing applications", "progress": 12.5}
+ *     {"done": true}
+ *
+ * Failures are reported as {"error": "..."}, followed by a non-zero exit code.
+ */
+
+error_reporting( E_ALL & ~E_NOTICE & ~E_STRICT & ~E_DEPRECATED );
+
+function ipsv_emit( $data )
+{
+	fwrite( STDOUT, json_encode( $data ) . "\n" );
+	fflush( STDOUT );
+}
+
+set_exception_handler( function( $e )
+{
+	ipsv_emit( array( 'error' => get_class( $e ) . ': ' . $e->getMessage() ) );
+	exit( 1 );
+} );
+
+$job = json_decode( stream_get_contents( STDIN ), TRUE );
+if ( !is_array( $job ) )
+{
+	ipsv_emit( array( 'error' => 'Unable to read the installation settings' ) );
+	exit( 2 );
+}
+
+$root = rtrim( $job['root'], '/' );
+$url = parse_url( $job['url'] );
+chdir( $root );
+
+/* IPS reads the request environment while bootstrapping, so describe the request the web installer would get */
+$_SERVER['HTTP_HOST'] = $url['host'] . ( isset( $url['port'] ) ? ':' . $url['port'] : '' );
+$_SERVER['SERVER_NAME'] = $url['host'];
+$_SERVER['SERVER_PORT'] = isset( $url['port'] ) ? $url['port'] : ( $url['scheme'] === 'https' ? 443 : 80 );
+$_SERVER['HTTPS'] = $url['scheme'] === 'https' ? 'on' : 'off';
+$_SERVER['REQUEST_URI'] = '/admin/install/index.php';
+$_SERVER['SCRIPT_NAME'] = '/admin/install/index.php';
+$_SERVER['SCRIPT_FILENAME'] = $root . '/admin/install/index.php';
+$_SERVER['REQUEST_METHOD'] = 'GET';
+$_SERVER['REMOTE_ADDR'] = '127.0.0.1';
+
+/* Write the configuration file the web installer's server details step would write */
+$db = array(
+	'sql_host'			=> $job['db']['host'],
+	'sql_database'		=> $job['db']['name'],
+	'sql_user'			=> $job['db']['user'],
+	'sql_pass'			=> $job['db']['pass'],
+	'sql_port'			=> (int) $job['db']['port'],
+	'sql_socket'		=> '',
+	'sql_tbl_prefix'	=> '',
+	'sql_utf8mb4'		=> FALSE,
+);
+$INFO = array_merge( $db, array(
+	'board_start'	=> time(),
+	'installed'		=> FALSE,
+	'base_url'		=> $job['url'],
+	'guest_group'	=> 2,
+	'member_group'	=> 3,
+	'admin_group'	=> 4,
+) );
+file_put_contents( $root . '/conf_global.php', "<?php\n\n\$INFO = " . var_export( $INFO, TRUE ) . ";" );
+
+define( 'REPORT_EXCEPTIONS', FALSE );
+require $root . '/init.php';
+\IPS\Dispatcher\Setup::i()->setLocation( 'install' );
+
+/* Install every bundled application, core first */
+$apps = array( 'core' );
+foreach ( new \DirectoryIterator( $root . '/applications' ) as $dir )
+{
+	if ( $dir->isDir() and !$dir->isDot() and $dir->getFilename() !== 'core' and file_exists( $dir->getPathname() . '/data/application.json' ) )
+	{
+		$apps[] = $dir->getFilename();
+	}
+}
+$defaultApp = in_array( 'forums', $apps ) ? 'forums' : 'core';
+
+$install = new \IPS\core\Setup\Install( $apps, $defaultApp, $job['url'], $root, $db, $job['admin']['name'], $job['admin']['pass'], $job['admin']['email'], FALSE );
+
+/* Step through the installation exactly like the MultipleRedirect does, without the HTTP round trips */
+$data = 0;
+while ( TRUE )
+{
+	$result = $install->process( $data );
+	if ( $result === NULL )
+	{
+		break;
+	}
+
+	$data = $result[0];
+	ipsv_emit( array( 'stage' => isset( $result[1] ) ? trim( strip_tags( $result[1] ) ) : '', 'progress' => isset( $result[2] ) ? (float) $result[2] : 0 ) );
+}
+
+\IPS\Db::i()->update( 'core_sys_conf_settings', array( 'conf_value' => $job['license'] ), array( 'conf_key=?', 'ipb_reg_number' ) );
+ipsv_emit( array( 'done' => TRUE ) );
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import uuid
+import logging
+
+
+class InstallReport(object):
+    """
+    Per-stage timings of a single IPS installation, as reported by the installer's MultipleRedirect responses. Reports
+    are saved as JSON files in the log directory.
+    """
+    DIRNAME = 'ipsv-installs'
+
+    def __init__(self, ctx, site):
+        """
+        @type   ctx:    ips_vagrant.cli.Context
+        @param  site:   The IPS Site being installed
+        @type   site:   ips_vagrant.models.sites.Site
+        """
+        self.path = os.path.join(ctx.config.get('Paths', 'Log'), self.DIRNAME)
+        self.log = logging.getLogger('ipsv.installer.report')
+        self._start = time.time()
+        self.data = {
+            'domain': site.domain.name,
+            'site': site.name,
+            'version': site.version,
+            'started': int(self._start),
+            'elapsed': 0.0,
+            'status': None,
+            'error': None,
+            'requests': 0,
+            'bytes': 0,
+            'stages': []
+        }
+
+    def record(self, stage, elapsed, size, progress=None):
+        """
+        Record a request made while the installer was running a stage
+        @param  stage:      Stage label
+        @type   stage:      str
+        @param  elapsed:    Seconds the request took
+        @type   elapsed:    float
+        @param  size:       Response size in bytes
+        @type   size:       int
+        @param  progress:   Installation progress reported at the end of the request
+        @type   progress:   int or None
+        """
+        stages = self.data['stages']
+        if not stages or stages[-1]['stage'] != stage:
+            stages.append({'stage': stage, 'elapsed': 0.0, 'requests': 0, 'bytes': 0, 'progress': None})
+
+        for entry in (stages[-1], self.data):
+            entry['requests'] += 1
+            entry['bytes'] += size
+        stages[-1]['elapsed'] += elapsed
+        if progress is not None:
+            stages[-1]['progress'] = progress
+
+    def save(self, status='complete', error=None):
+        """
+        Save the report. Reports are informational, so failing to write one never fails the installation.
+        @param  status: complete or failed
+        @type   status: str
+        @param  error:  The error the installation failed with
+        @type   error:  str or None
+        @return:    The report's file path, or None if it could not be written
+        @rtype:     str or None
+        """
+        self.data['status'] = status
+        self.data['error'] = error
+        self.data['elapsed'] = time.time() - self._start
+
+        filename = '{t}-{d}-{s}-{u}.json'.format(t=time.strftime('%Y%m%d%H%M%S', time.localtime(self._start)),
+                                                 d=self.data['domain'], s=self.data['site'], u=uuid.uuid4().hex[:8])
+        report_path = os.path.join(self.path, filename)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0o755, exist_ok=True)
+            with open(report_path, 'w') as f:
+                json.dump(self.data, f, indent=2)
+        except (IOError, OSError) as e:
+            self.log.warn('Unable to save the installation report (%s): %s', str(e), report_path)
+            return None
+
+        self.log.info('Installation report saved: %s', report_path)
+        return report_path
+
+    @classmethod
+    def load_all(cls, ctx):
+        """
+        Load every saved installation report
+        @type   ctx:    ips_vagrant.cli.Context
+        @rtype: list of dict
+        """
+        log = logging.getLogger('ipsv.installer.report')
+        path = os.path.join(ctx.config.get('Paths', 'Log'), cls.DIRNAME)
+        if not os.path.isdir(path):
+            return []
+
+        reports = []
+        for filename in sorted(os.listdir(path)):
+            if not filename.endswith('.json'):
+                continue
+
+            try:
+                with open(os.path.join(path, filename)) as f:
+                    reports.append(json.load(f))
+            except (IOError, ValueError) as e:
+                log.warn('Skipping unreadable installation report (%s): %s', str(e), filename)
+
+        return reports
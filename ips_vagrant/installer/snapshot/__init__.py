@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import time
+import click
+import fcntl
+import random
+import shutil
+import string
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from sqlalchemy.sql import text
+from ips_vagrant.common.clone import TreeCloner
+from ips_vagrant.common.mysql import MysqlAdmin, quote_identifier
+
+
+class Snapshot(object):
+    """
+    Post-installation database snapshot of an IPS release, restored in place of running the web installer.
+
+    The snapshot's tables are kept server-side in a template database, while the files the installer writes
+    (conf_global.php and uploads) are kept under the data directory.
+    """
+    FILENAME = 'snapshot.json'
+
+    # Snapshots are captured at most once per version, even by concurrent installations
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, ctx, version):
+        """
+        @type   ctx:        ips_vagrant.cli.Context
+        @param  version:    IPS version the snapshot was (or will be) captured from
+        @type   version:    ips_vagrant.common.version.Version
+        """
+        self.ctx = ctx
+        self.version = version
+        self.log = logging.getLogger('ipsv.installer.snapshot')
+
+        self.slug = re.sub('[^0-9a-zA-Z]+', '_', version.vstring.lower()).strip('_')
+        self.path = os.path.join(ctx.config.get('Paths', 'Data'), 'snapshots', self.slug)
+        self.db_name = 'ipsv_tpl_{s}'.format(s=self.slug)
+        self.mysql = MysqlAdmin.get(ctx.config)
+
+    @property
+    def meta(self):
+        """
+        Get the snapshot metadata
+        @rtype: dict or None
+        """
+        meta_path = os.path.join(self.path, self.FILENAME)
+        if not os.path.isfile(meta_path):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            self.log.warn('Unreadable snapshot metadata, ignoring the snapshot (%s): %s', str(e), meta_path)
+            return None
+
+    @property
+    def exists(self):
+        """
+        Check whether a complete snapshot has been captured for this version
+        @rtype: bool
+        """
+        if not self.meta:
+            return False
+
+        if not self.mysql.database_exists(self.db_name):
+            self.log.warn('Snapshot template database is missing, ignoring the snapshot: %s', self.db_name)
+            return False
+
+        return True
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold this version's snapshot lock, across both threads and processes
+        """
+        with self._locks_lock:
+            thread_lock = self._locks.setdefault(self.slug, threading.Lock())
+
+        lock_dir = os.path.dirname(self.path)
+        if not os.path.isdir(lock_dir):
+            os.makedirs(lock_dir, 0o755, exist_ok=True)
+
+        with thread_lock, open('{p}.lock'.format(p=self.path), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def capture(self, site):
+        """
+        Capture a snapshot from a freshly installed site
+        @type   site:   ips_vagrant.models.sites.Site
+        """
+        self.log.info('Capturing a snapshot of IPS %s from %s', self.version.vstring, site.db_name)
+        tmpdir = tempfile.mkdtemp('.tmp', self.slug, os.path.dirname(self.path))
+        try:
+            self.mysql.execute_batch(['DROP DATABASE IF EXISTS {db}'.format(db=quote_identifier(self.db_name)),
+                                      'CREATE DATABASE {db}'.format(db=quote_identifier(self.db_name))])
+            self.mysql.copy_database(site.db_name, self.db_name)
+            admin_id = self.mysql.execute('SELECT MIN(member_id) FROM `{db}`.core_members'
+                                          .format(db=self.db_name)).scalar()
+
+            shutil.copy2(os.path.join(site.root, 'conf_global.php'), os.path.join(tmpdir, 'conf_global.php'))
+            uploads_path = os.path.join(site.root, 'uploads')
+            if os.path.isdir(uploads_path):
+                TreeCloner(uploads_path, 'reflink').clone(os.path.join(tmpdir, 'uploads'))
+
+            # The metadata is written last, as it marks the snapshot as complete
+            with open(os.path.join(tmpdir, self.FILENAME), 'w') as f:
+                json.dump({'version': self.version.vstring, 'vid': self.version.vid, 'db_name': self.db_name,
+                           'admin_id': admin_id, 'captured': int(time.time())}, f, indent=2)
+
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            os.rename(tmpdir, self.path)
+        except Exception:
+            self.mysql.drop_databases([(self.db_name, None)])
+            raise
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.log.info('Snapshot captured: %s', self.path)
+
+    def restore(self, site):
+        """
+        Restore the snapshot into a site with freshly copied setup files and an empty database, then patch the
+        site specific data (URL, admin account and license key)
+        @type   site:   ips_vagrant.models.sites.Site
+        """
+        meta = self.meta
+        self.log.info('Restoring the IPS %s snapshot into %s', self.version.vstring, site.db_name)
+        self.mysql.copy_database(self.db_name, site.db_name)
+
+        conf_path = os.path.join(site.root, 'conf_global.php')
+        if os.path.lexists(conf_path):
+            os.remove(conf_path)
+        shutil.copy2(os.path.join(self.path, 'conf_global.php'), conf_path)
+        rewrite_config(conf_path, {
+            'sql_host': site.db_host,
+            'sql_database': site.db_name,
+            'sql_user': site.db_user,
+            'sql_pass': site.db_pass,
+            'base_url': '{scheme}://{host}/'.format(scheme='https' if site.ssl else 'http', host=site.domain.name)
+        })
+
+        uploads_path = os.path.join(self.path, 'uploads')
+        if os.path.isdir(uploads_path):
+            TreeCloner(uploads_path, 'reflink').clone(os.path.join(site.root, 'uploads'))
+
+        user, password, email = admin_credentials(self.ctx)
+        salt = ''.join(random.SystemRandom().choice(string.ascii_letters + string.digits) for _ in range(22))
+        with self.mysql.connect() as conn:
+            conn.execute(
+                text('UPDATE `{db}`.core_members SET name = :name, members_seo_name = :seo_name, email = :email, '
+                     'members_pass_hash = :pass_hash, members_pass_salt = :salt WHERE member_id = :id'
+                     .format(db=site.db_name)),
+                name=user, seo_name=re.sub('[^a-z0-9]+', '-', user.lower()).strip('-'), email=email,
+                pass_hash=self._encrypt_password(password, salt), salt=salt, id=meta['admin_id']
+            )
+            conn.execute(text("UPDATE `{db}`.core_sys_conf_settings SET conf_value = :value "
+                              "WHERE conf_key = 'ipb_reg_number'".format(db=site.db_name)),
+                         value='{license}-TESTINSTALL'.format(license=site.license_key))
+            conn.execute(text("UPDATE `{db}`.core_sys_conf_settings SET conf_value = :value "
+                              "WHERE conf_key IN ('email_in', 'email_out')".format(db=site.db_name)), value=email)
+
+            # Cached license data and sessions belong to the site the snapshot was captured from
+            conn.execute('DELETE FROM `{db}`.core_store'.format(db=site.db_name))
+            conn.execute('DELETE FROM `{db}`.core_sessions'.format(db=site.db_name))
+
+        self.log.info('Snapshot restored to: %s', site.root)
+
+    def _encrypt_password(self, password, salt):
+        """
+        Hash a member password the way IPS does, using PHP's crypt()
+        @type   password:   str
+        @type   salt:       str
+        @rtype: str
+        """
+        code = "echo crypt(stream_get_contents(STDIN), '$2a$13$' . $argv[1]);"
+        process = subprocess.Popen([self.ctx.config.get('Installer', 'PhpBinary'), '-r', code, '--', salt],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        output, __ = process.communicate(password.encode('utf-8'))
+        if process.returncode:
+            raise SnapshotError('Unable to hash the admin password with PHP (exit code {c})'
+                                .format(c=process.returncode))
+
+        return output.decode('utf-8')
+
+
+def admin_credentials(ctx):
+    """
+    Get the admin credentials for new installations, prompting for any that haven't been saved
+    @type   ctx:    ips_vagrant.cli.Context
+    @return:    Admin display name, password and email
+    @rtype:     tuple of (str, str, str)
+    """
+    user = ctx.config.get('User', 'AdminUser') or click.prompt('Admin display name')
+    password = ctx.config.get('User', 'AdminPass') or \
+        click.prompt('Admin password', hide_input=True, confirmation_prompt='Confirm admin password')
+    email = ctx.config.get('User', 'AdminEmail') or click.prompt('Admin email')
+    return user, password, email
+
+
+def rewrite_config(path, settings):
+    """
+    Replace string settings in an IPS conf_global.php file
+    @param  path:       Configuration file path
+    @type   path:       str
+    @param  settings:   Setting values, by key
+    @type   settings:   dict
+    """
+    with open(path) as f:
+        config = f.read()
+
+    for key, value in settings.items():
+        value = "'{v}'".format(v=value.replace('\\', '\\\\').replace("'", "\\'"))
+        pattern = r"""(['"]{k}['"]\s*=>\s*)(?:'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")""".format(k=re.escape(key))
+        config = re.sub(pattern, lambda m: m.group(1) + value, config)
+
+    with open(path, 'w') as f:
+        f.write(config)
+
+
+class SnapshotError(Exception):
+    pass
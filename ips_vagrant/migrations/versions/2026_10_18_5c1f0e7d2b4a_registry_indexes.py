@@ -0,0 +1,27 @@
+"""Registry indexes
+
+Revision ID: 5c1f0e7d2b4a
+Revises: 3a94451d9c60
+Create Date: 2026-10-18 14:12:37.502841
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7d2b4a'
+down_revision = '3a94451d9c60'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index('ix_domains_name', 'domains', ['name'])
+    # Site names are looked up case-insensitively, so the index has to use the same collation to be used
+    op.create_index('ix_sites_domain_id_name', 'sites', ['domain_id', sa.text('name COLLATE NOCASE')])
+
+
+def downgrade():
+    op.drop_index('ix_sites_domain_id_name', 'sites')
+    op.drop_index('ix_domains_name', 'domains')
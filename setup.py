@@ -31,10 +31,11 @@ setup(
     packages=find_packages(),
     package_data={'ips_vagrant': ['config/*.conf', 'generators/templates/nginx/*.tpl',
                                   'generators/templates/php5-fpm/*.tpl', 'alembic.ini', 'WELCOME.rst', 'man/*',
-                                  'README.rst']},
+                                  'README.rst', 'installer/headless/*.php']},
     entry_points={
         'console_scripts': [
-            'ipsv = ips_vagrant.cli:cli'
+            'ipsv = ips_vagrant.cli:cli',
+            'ipsvd = ips_vagrant.daemon.server:cli'
         ]
     },
     install_requires=['beautifulsoup4>=4.4.1,<4.5', 'mechanize>=0.2.5,<0.3', 'click>=5.1,<5.2', 'requests>=2.2.1,<2.3',
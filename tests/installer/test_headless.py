@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import textwrap
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from ips_vagrant.cli import Context
+from ips_vagrant.common import config
+from ips_vagrant.installer.headless import CliInstaller
+from ips_vagrant.installer.latest import InstallationError
+
+
+class CliInstallerTestCase(unittest.TestCase):
+    """
+    Runs the CLI installer against stub installer scripts, run with the Python interpreter in place of the PHP CLI
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.ctx = Context()
+        self.ctx.config = config()
+        self.ctx.config.set('Paths', 'Log', self.tmpdir)
+        self.ctx.config.set('MySQL', 'Port', '3307')
+        self.ctx.config.set('Installer', 'RequestTimeout', '1')
+        for key, value in (('AdminUser', 'admin'), ('AdminPass', 'secret'), ('AdminEmail', 'admin@example.test')):
+            self.ctx.config.set('User', key, value)
+
+        self.site = SimpleNamespace(domain=SimpleNamespace(name='example.test'), name='test', version='4.1.5',
+                                    root=self.tmpdir, ssl=0, license_key='LICENSE', in_dev=False, db_host='localhost',
+                                    db_name='ipsv_test', db_user='ipsv_test', db_pass='password')
+
+        patcher = mock.patch('ips_vagrant.installer.headless.MysqlAdmin')
+        self.mysql = patcher.start().get.return_value
+        self.mysql.tables.return_value = []
+        self.addCleanup(patcher.stop)
+
+    def installer(self, source, force=False):
+        """
+        Get an installer running a stub script
+        @param  source: Python source of the stub installer script
+        @type   source: str
+        @type   force:  bool
+        @rtype: CliInstaller
+        """
+        script = os.path.join(self.tmpdir, 'install.py')
+        with open(script, 'w') as f:
+            f.write('import sys, json, time\njob = json.load(sys.stdin)\n' + textwrap.dedent(source))
+
+        return CliInstaller(self.ctx, self.site, force, php=sys.executable, script=script)
+
+    def test_progress_is_reported(self):
+        installer = self.installer("""
+            for stage, progress in (('Installing core', 10), ('Installing forums', 60)):
+                print(json.dumps({'stage': stage, 'progress': progress}), flush=True)
+            print(json.dumps({'stage': 'Port {p}'.format(p=job['db']['port']), 'progress': 90}), flush=True)
+            print(json.dumps({'done': True}), flush=True)
+        """)
+        installer.start()
+
+        stages = [entry['stage'] for entry in installer.report.data['stages']]
+        self.assertEqual(stages, ['Starting installation', 'Installing core', 'Installing forums', 'Port 3307'])
+        self.assertEqual(installer.report.data['stages'][1]['progress'], 60)
+        self.assertEqual(installer.report.data['status'], 'complete')
+
+    def test_error_event_fails_with_stderr_tail(self):
+        installer = self.installer("""
+            sys.stderr.write('PHP Warning: ignored\\nPHP Fatal error: out of memory\\n')
+            print(json.dumps({'error': 'RuntimeException: installation failed'}), flush=True)
+            sys.exit(1)
+        """)
+        with self.assertRaises(InstallationError) as cm:
+            installer.start()
+
+        self.assertEqual(str(cm.exception), 'RuntimeException: installation failed: PHP Fatal error: out of memory')
+        self.assertEqual(installer.report.data['status'], 'failed')
+
+    def test_exit_code_fails_with_stderr_tail(self):
+        installer = self.installer("""
+            print(json.dumps({'stage': 'Installing core', 'progress': 10}), flush=True)
+            sys.stderr.write('Segmentation fault\\n')
+            sys.exit(139)
+        """)
+        with self.assertRaises(InstallationError) as cm:
+            installer.start()
+
+        self.assertEqual(str(cm.exception), 'The CLI installer exited with code 139: Segmentation fault')
+
+    def test_silent_installer_is_killed(self):
+        installer = self.installer("""
+            time.sleep(30)
+        """)
+        start = time.time()
+        with self.assertRaises(InstallationError) as cm:
+            installer.start()
+
+        self.assertLess(time.time() - start, 10)
+        self.assertIn('made no progress within 1 seconds', str(cm.exception))
+
+    def test_existing_tables_require_force(self):
+        self.mysql.tables.return_value = ['core_members', 'core_sessions']
+        installer = self.installer("""
+            print(json.dumps({'done': True}), flush=True)
+        """)
+        with self.assertRaises(InstallationError):
+            installer.start()
+        self.mysql.execute_batch.assert_not_called()
+
+        installer.force = True
+        installer.start()
+        statements = self.mysql.execute_batch.call_args[0][0]
+        self.assertIn('DROP TABLE `ipsv_test`.`core_members`', statements)
+        self.assertIn('DROP TABLE `ipsv_test`.`core_sessions`', statements)
+
+
+if __name__ == '__main__':
+    unittest.main()